@@ -0,0 +1,193 @@
+import os
+import sys
+import time
+import dbus
+import select
+import socket
+
+
+POWER_SUPPLY = '/sys/class/power_supply'
+NETLINK_KOBJECT_UEVENT = 15
+
+
+def read(path, name, default=None):
+    try:
+        with open(os.path.join(path, name)) as file:
+            return file.read().strip()
+    except OSError:
+        return default
+
+
+def supplies(kind):
+    try:
+        names = sorted(os.listdir(POWER_SUPPLY))
+    except OSError:
+        return []
+    
+    # Батареи мышей и геймпадов (scope=Device) в общий заряд не входят
+    return [
+        os.path.join(POWER_SUPPLY, name) for name in names
+        if read(os.path.join(POWER_SUPPLY, name), 'type') == kind
+        and read(os.path.join(POWER_SUPPLY, name), 'scope') != 'Device'
+    ]
+
+
+def snapshot():
+    batteries = supplies('Battery')
+    
+    if not batteries:
+        return None, None
+    
+    # Несколько батарей сводятся к общему заряду по энергии, а если драйвер
+    # её не отдаёт, к среднему процентов
+    now = [read(path, 'energy_now') or read(path, 'charge_now') for path in batteries]
+    full = [read(path, 'energy_full') or read(path, 'charge_full') for path in batteries]
+    
+    if all(value and value.isdigit() for value in now + full) and sum(map(int, full)):
+        level = round(100 * sum(map(int, now)) / sum(map(int, full)))
+    else:
+        levels = [int(read(path, 'capacity', '100')) for path in batteries]
+        level = round(sum(levels) / len(levels))
+    
+    mains = supplies('Mains')
+    
+    if mains:
+        charging = any(read(path, 'online') == '1' for path in mains)
+    else:
+        charging = any(read(path, 'status') in ('Charging', 'Full') for path in batteries)
+    
+    return min(level, 100), charging
+
+
+class Notifier:
+    def __init__(self):
+        self.interface = None
+        self.last = 0
+    
+    
+    def notify(self, summary, body, urgency=1):
+        try:
+            if self.interface is None:
+                self.interface = dbus.Interface(
+                    dbus.SessionBus().get_object(
+                        'org.freedesktop.Notifications',
+                        '/org/freedesktop/Notifications'
+                    ),
+                    'org.freedesktop.Notifications'
+                )
+            
+            # Новое уведомление заменяет предыдущее, а не копится в стопке
+            self.last = self.interface.Notify(
+                'battery_monitor',
+                dbus.UInt32(self.last),
+                '',
+                summary,
+                body,
+                dbus.Array([], signature='s'),
+                dbus.Dictionary({'urgency': dbus.Byte(urgency)}, signature='sv'),
+                -1
+            )
+        except dbus.exceptions.DBusException as exception:
+            print(exception, file=sys.stderr)
+            self.interface = None
+
+
+class BatteryMonitor:
+    low = 20
+    critical = 10
+    
+    
+    def __init__(self, notifier):
+        self.notifier = notifier
+        self.charging = None
+        self.notified_low = False
+        self.notified_critical = False
+    
+    
+    def update(self, level, charging):
+        if level is None:
+            return None
+        
+        if self.charging is not None and charging != self.charging:
+            if charging:
+                self.notifier.notify(
+                    '󰚥 Компьютер подключен к сети электропитания.',
+                    f'Текущий уровень заряда: {level}%'
+                )
+                self.notified_low = False
+                self.notified_critical = False
+            else:
+                self.notifier.notify(
+                    '󰚦 Компьютер отключен от сети электропитания.',
+                    f'Текущий уровень заряда: {level}%'
+                )
+        
+        self.charging = charging
+        
+        # Повторное предупреждение только после подъёма заряда выше порога
+        if level >= self.low:
+            self.notified_low = False
+            self.notified_critical = False
+        
+        elif charging:
+            return None
+        
+        elif level < self.critical:
+            if not self.notified_critical:
+                self.notifier.notify(
+                    '󱃍 Критически низкий уровень заряда.',
+                    'Подключите компьютер к сети электропитания прямо сейчас.',
+                    urgency=2
+                )
+                self.notified_critical = True
+        
+        elif not self.notified_low:
+            self.notifier.notify(
+                '󰂎 Низкий уровень заряда.',
+                'Возможно, вам стоит подключить компьютер к сети электропитания.'
+            )
+            self.notified_low = True
+
+
+def uevents():
+    # События ядра о power_supply приходят сразу при подключении и
+    # отключении питания; без netlink остаётся опрос sysfs
+    try:
+        listener = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        listener.bind((0, 1))
+        
+        return listener
+    except (OSError, AttributeError) as exception:
+        print(f'netlink unavailable, polling sysfs: {exception}', file=sys.stderr)
+        
+        return None
+
+
+def is_power_supply(message):
+    return b'\0SUBSYSTEM=power_supply\0' in message + b'\0'
+
+
+def run(interval=60):
+    monitor = BatteryMonitor(Notifier())
+    listener = uevents()
+    monitor.update(*snapshot())
+    deadline = time.monotonic() + interval
+    
+    while True:
+        # Ёмкость не у всех драйверов порождает uevent, поэтому опрос по
+        # тайм-ауту остаётся и при работающем netlink
+        timeout = max(0, deadline - time.monotonic())
+        ready, _, _ = select.select([listener] if listener else [], [], [], timeout)
+        
+        if ready and not is_power_supply(listener.recv(8192)):
+            continue
+        
+        deadline = time.monotonic() + interval
+        monitor.update(*snapshot())
+
+
+if __name__ == '__main__':
+    try:
+        run()
+    except KeyboardInterrupt:
+        pass
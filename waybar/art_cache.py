@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+
+def cache_home():
+    return os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+
+
+class PixmapCache:
+    def __init__(self, capacity=32):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+    
+    
+    def get(self, key):
+        entry = self.entries.get(key)
+        
+        if entry is not None:
+            self.entries.move_to_end(key)
+        
+        return entry
+    
+    
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+    
+    
+    def discard(self, key):
+        self.entries.pop(key, None)
+    
+    
+    def __contains__(self, key):
+        return key in self.entries
+
+
+class ArtCache:
+    def __init__(self, directory=None, max_bytes=64 * 1024 * 1024):
+        self.directory = directory or os.path.join(cache_home(), 'soft_dots', 'art')
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        
+        os.makedirs(self.directory, exist_ok=True)
+    
+    
+    @staticmethod
+    def key(art_url):
+        return hashlib.sha1(art_url.encode()).hexdigest()
+    
+    
+    def paths(self, art_url):
+        base = os.path.join(self.directory, self.key(art_url))
+        
+        return base + '.png', base + '.json'
+    
+    
+    def lookup(self, art_url):
+        image_path, meta_path = self.paths(art_url)
+        
+        try:
+            with open(meta_path) as file:
+                meta = json.load(file)
+        except (OSError, ValueError):
+            return None, None
+        
+        if meta.get('url') != art_url or not os.path.exists(image_path):
+            return None, None
+        
+        return image_path, meta
+    
+    
+    def touch(self, art_url, meta=None):
+        image_path, meta_path = self.paths(art_url)
+        
+        with self.lock:
+            try:
+                if meta is not None:
+                    self.write(meta_path, json.dumps(meta).encode())
+                
+                # mtime файла изображения служит отметкой для LRU-вытеснения
+                os.utime(image_path)
+            except OSError:
+                pass
+    
+    
+    def store(self, art_url, image_data, meta):
+        image_path, meta_path = self.paths(art_url)
+        meta = dict(meta, url=art_url, stored=time.time())
+        
+        with self.lock:
+            try:
+                self.write(image_path, image_data)
+                self.write(meta_path, json.dumps(meta).encode())
+            except OSError as exception:
+                print(exception)
+                
+                return None
+            
+            self.evict()
+    
+    
+    @staticmethod
+    def write(path, data):
+        temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        
+        with open(temporary, 'wb') as file:
+            file.write(data)
+        
+        os.replace(temporary, path)
+    
+    
+    def evict(self):
+        entries = []
+        total = 0
+        
+        with os.scandir(self.directory) as iterator:
+            for entry in iterator:
+                if not entry.name.endswith('.png'):
+                    continue
+                
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        
+        entries.sort()
+        
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            
+            for victim in (path, path[:-4] + '.json'):
+                try:
+                    os.remove(victim)
+                except OSError:
+                    pass
+            
+            total -= size
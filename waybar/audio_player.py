@@ -1,21 +1,33 @@
+import os
 import sys
-import dbus
-import requests
-import traceback
+import time
+import tracing
+import instance
+import threading
 
-from PIL import Image
 from io import BytesIO
+from string import Template
+from art_cache import ArtCache, PixmapCache
+from control import ControlServer
 from urllib.parse import unquote
 from PyQt6.QtCore import (
     Qt,
+    QBuffer,
+    QByteArray,
+    QIODevice,
+    QObject,
+    QSize,
+    QRunnable,
+    QThreadPool,
     QTimer,
     QPropertyAnimation,
     QEasingCurve,
-    QPoint
+    QPoint,
+    pyqtSignal
 )
-from dbus.mainloop.glib import DBusGMainLoop
 from PyQt6.QtGui import (
     QImage,
+    QImageReader,
     QPixmap,
     QPainter,
     QPainterPath,
@@ -27,17 +39,99 @@ from PyQt6.QtWidgets import (
     QLabel,
     QPushButton,
     QSlider,
+    QStyle,
     QVBoxLayout,
     QHBoxLayout
 )
 
 
-class AlbumArtLoader:
+class ArtTask(QRunnable):
+    def __init__(self, loader, generation, art_url):
+        super().__init__()
+        
+        self.loader = loader
+        self.generation = generation
+        self.art_url = art_url
+    
+    
+    def cancelled(self):
+        # Предзагрузка (generation is None) не отменяется сменой трека
+        if self.generation is None:
+            return False
+        
+        return self.generation != self.loader.generation
+    
+    
+    def run(self):
+        if self.cancelled():
+            return None
+        
+        try:
+            image, palette = AlbumArtLoader.render(
+                self.art_url,
+                self.loader.size,
+                self.loader.radius,
+                self.cancelled,
+                self.loader.cache
+            )
+        except Exception as exception:
+            tracing.error('art', exception)
+            image, palette = None, None
+        
+        # Пустая палитра тоже уходит виджету: обложка без палитры или
+        # незагрузившаяся обложка возвращает стандартные цвета вместо
+        # оставшихся от прошлого трека
+        self.loader.coloured.emit(self.art_url, palette or {})
+        
+        if self.generation is None:
+            self.loader.prefetched.emit(self.art_url, image or QImage())
+        elif not self.cancelled():
+            self.loader.loaded.emit(self.generation, image or QImage())
+
+
+class AlbumArtLoader(QObject):
+    loaded = pyqtSignal(int, QImage)
+    prefetched = pyqtSignal(str, QImage)
+    coloured = pyqtSignal(str, dict)
+    revalidate_after = 24 * 60 * 60
+    retry_failed_after = 5 * 60
+    max_failed = 32
+    decoder = os.environ.get('SOFT_DOTS_ART_DECODER', 'pil')
+    extract_palette = os.environ.get('SOFT_DOTS_ART_PALETTE') == '1'
+    max_bytes = 8 * 1024 * 1024
+    http = None
+    session_lock = threading.Lock()
+    
+    
+    def __init__(self, label, size=184, radius=14, threads=2, cache=None):
+        super().__init__(label)
+        
+        self.label = label
+        self.size = size
+        self.radius = radius
+        self.cache = cache
+        self.pixmaps = PixmapCache()
+        self.palettes = PixmapCache()
+        self.pending = None
+        self.prefetching = set()
+        self.failed = {}
+        
+        # Каждый новый запрос увеличивает поколение, а задачи и результаты
+        # предыдущих поколений отбрасываются
+        self.generation = 0
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(threads)
+        self.loaded.connect(self.on_loaded)
+        self.prefetched.connect(self.on_prefetched)
+        self.coloured.connect(self.on_coloured)
+    
+    
     @staticmethod
-    def rounded_pixmap(pixmap: QPixmap, radius: int) -> QPixmap:
-        size = pixmap.size()
+    @tracing.traced('art.round')
+    def rounded_image(image: QImage, radius: int) -> QImage:
+        size = image.size()
         
-        rounded = QPixmap(size)
+        rounded = QImage(size, QImage.Format.Format_ARGB32_Premultiplied)
         rounded.fill(Qt.GlobalColor.transparent)
         
         painter = QPainter(rounded)
@@ -47,218 +141,562 @@ class AlbumArtLoader:
         path.addRoundedRect(0, 0, size.width(), size.height(), radius, radius)
         
         painter.setClipPath(path)
-        painter.drawPixmap(0, 0, pixmap)
+        painter.drawImage(0, 0, image)
         painter.end()
         
         return rounded
     
     
     @staticmethod
-    def load_artwork(art_url, label, size=184):
-        if not art_url:
-            label.clear()
-            
-            return None
+    def session():
+        import requests
         
-        try:
-            image_data = None
+        with AlbumArtLoader.session_lock:
+            if AlbumArtLoader.http is None:
+                # Один keep-alive пул на все потоки загрузчика, чтобы
+                # повторные запросы к тому же CDN не открывали соединение
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=4
+                )
+                http = requests.Session()
+                http.mount('http://', adapter)
+                http.mount('https://', adapter)
+                
+                AlbumArtLoader.http = http
             
-            if art_url.startswith('file://'):
-                try:
-                    with open(unquote(art_url[7:]), 'rb') as file:
-                        image_data = file.read()
-                except:
-                    pass
+            return AlbumArtLoader.http
+    
+    
+    @staticmethod
+    def fetch(art_url, meta=None, max_bytes=None):
+        # Возвращает (данные, метаданные для кэша). Пустые данные при
+        # непустых метаданных означают, что закэшированная копия актуальна
+        max_bytes = max_bytes or AlbumArtLoader.max_bytes
+        
+        if art_url.startswith('file://'):
+            path = unquote(art_url[7:])
             
-            elif art_url.startswith(('http://', 'https://')):
-                request = requests.get(art_url, timeout=5)
+            try:
+                stat = os.stat(path)
                 
-                if request.status_code == 200:
-                    image_data = request.content
-            
-            if not image_data:
-                return None
+                if meta and meta.get('mtime') == stat.st_mtime_ns:
+                    return None, meta
+                
+                # Ограничение размера касается только загрузок: локальную
+                # обложку показываем любую
+                with open(path, 'rb') as file:
+                    return file.read(), {'mtime': stat.st_mtime_ns}
+            except:
+                return None, None
+        
+        elif art_url.startswith(('http://', 'https://')):
+            import requests
             
-            image = Image.open(BytesIO(image_data)).convert('RGB')
-            image = image.resize((size, size), Image.Resampling.LANCZOS)
+            now = time.time()
+            headers = {}
             
-            q_image = QImage(
-                image.tobytes('raw', 'RGB'),
-                size, size,
-                size * 3,
-                QImage.Format.Format_RGB888
-            )
+            if meta:
+                if now - meta.get('checked', 0) < AlbumArtLoader.revalidate_after:
+                    return None, meta
+                
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
             
-            pixmap = QPixmap.fromImage(q_image)
-            pixmap = AlbumArtLoader.rounded_pixmap(pixmap, 14)
+            # Если проверить копию не удалось (нет сети, ошибка сервера),
+            # показываем её как есть, а проверку повторим в следующий раз
+            failed = (None, meta) if meta else (None, None)
             
-            label.setPixmap(pixmap)
-        except Exception as exception:
-            print(exception)
-            label.clear()
-
-
-class MPRIS:
-    def __init__(self):
-        DBusGMainLoop(set_as_default=True)
+            try:
+                with AlbumArtLoader.session().get(
+                    art_url,
+                    headers=headers,
+                    timeout=5,
+                    stream=True
+                ) as request:
+                    if request.status_code == 304 and meta:
+                        return None, dict(meta, checked=now)
+                    
+                    if request.status_code != 200:
+                        return failed
+                    
+                    length = request.headers.get('Content-Length')
+                    
+                    if length and length.isdigit() and int(length) > max_bytes:
+                        return failed
+                    
+                    chunks = []
+                    total = 0
+                    
+                    for chunk in request.iter_content(64 * 1024):
+                        total += len(chunk)
+                        
+                        if total > max_bytes:
+                            return failed
+                        
+                        chunks.append(chunk)
+                    
+                    return b''.join(chunks), {
+                        'etag': request.headers.get('ETag'),
+                        'last_modified': request.headers.get('Last-Modified'),
+                        'checked': now
+                    }
+            except requests.RequestException as exception:
+                tracing.error('art', exception)
+                
+                return failed
         
-        self.bus = dbus.SessionBus()
-        self.current_player = None
-        self.properties = None
-        self.player = None
-        self.last_art = None
-        self.connected = False
+        return None, None
     
     
-    def get_players(self):
-        try:
-            return [
-                player for player in self.bus.list_names()
-                if player.startswith('org.mpris.MediaPlayer2.')
-            ]
-        except:
-            return []
+    @staticmethod
+    def encode(image: QImage) -> bytes:
+        array = QByteArray()
+        buffer = QBuffer(array)
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        image.save(buffer, 'PNG')
+        
+        return bytes(array)
     
     
-    def disconnect(self):
-        self.connected = False
-        self.current_player = None
-        self.properties = None
-        self.player = None
+    @staticmethod
+    def palette(image, meta=None):
+        if not AlbumArtLoader.extract_palette:
+            return None
+        
+        if meta and meta.get('palette'):
+            return meta['palette']
+        
+        import palette
+        
+        with tracing.span('art.palette'):
+            return palette.extract(image)
     
     
-    def _prioritised_players(self):
-        players = self.get_players()
+    @staticmethod
+    def render(art_url, size, radius, cancelled=lambda: False, cache=None):
+        # Возвращает (скруглённая обложка, палитра или None)
+        cached_path, cached_meta = cache.lookup(art_url) if cache else (None, None)
         
-        if not players:
-            return []
+        with tracing.span('art.fetch'):
+            image_data, meta = AlbumArtLoader.fetch(art_url, cached_meta)
         
+        if cached_path and not image_data and meta:
+            tracing.count('art.disk_hits')
+            
+            with tracing.span('art.disk_read'):
+                image = QImage(cached_path)
+            
+            if not image.isNull() and image.width() == size:
+                palette = AlbumArtLoader.palette(image, meta)
+                
+                # Палитра хранится в метаданных записи кэша и считается
+                # один раз на обложку
+                if palette and not meta.get('palette'):
+                    meta = dict(meta, palette=palette)
+                
+                cache.touch(art_url, meta if meta is not cached_meta else None)
+                
+                return AlbumArtLoader.rounded_image(image, radius), palette
+            
+            with tracing.span('art.fetch'):
+                image_data, meta = AlbumArtLoader.fetch(art_url)
         
-        def state_key(name):
-            try:
-                object = self.bus.get_object(name, '/org/mpris/MediaPlayer2')
-                properties = dbus.Interface(object, 'org.freedesktop.DBus.Properties')
-                string = str(
-                    properties.Get(
-                        'org.mpris.MediaPlayer2.Player',
-                        'PlaybackStatus'
-                    )
+        if not image_data or cancelled():
+            return None, None
+        
+        q_image, buffer = AlbumArtLoader.decode(image_data, size)
+        
+        if q_image is None or cancelled():
+            return None, None
+        
+        palette = AlbumArtLoader.palette(q_image)
+        
+        if cache and meta is not None:
+            with tracing.span('art.store'):
+                cache.store(
+                    art_url,
+                    AlbumArtLoader.encode(q_image),
+                    dict(meta, palette=palette) if palette else meta
                 )
-                
-                return {'Playing': 0, 'Paused': 1}.get(string, 2)
-            except:
-                return 3
         
-        players.sort(key=lambda n: (state_key(n), n))
+        # QImage не владеет buffer, поэтому скругляем, пока буфер жив
+        return AlbumArtLoader.rounded_image(q_image, radius), palette
+    
+    
+    @staticmethod
+    def decode(image_data, size):
+        # Большую локальную обложку QImageReader масштабирует при чтении
+        if AlbumArtLoader.decoder == 'qt' or len(image_data) > AlbumArtLoader.max_bytes:
+            q_image = AlbumArtLoader.decode_qt(image_data, size)
+            
+            if q_image is not None:
+                return q_image, None
         
-        return players
+        return AlbumArtLoader.decode_pil(image_data, size)
     
     
-    def connect_any(self):
-        self.disconnect()
+    @staticmethod
+    def decode_qt(image_data, size):
+        buffer = QBuffer()
+        buffer.setData(image_data)
+        buffer.open(QIODevice.OpenModeFlag.ReadOnly)
+        
+        # Для JPEG setScaledSize включает масштабирование на этапе DCT,
+        # так что обложка 3000×3000 не декодируется целиком
+        reader = QImageReader(buffer)
+        reader.setScaledSize(QSize(size, size))
         
-        for candidate in self._prioritised_players():
-            if self.connect(candidate):
-                return True
+        with tracing.span('art.decode'):
+            q_image = reader.read()
         
-        return False
+        return None if q_image.isNull() else q_image
     
     
-    def connect(self, name):
-        try:
-            object = self.bus.get_object(name, '/org/mpris/MediaPlayer2')
-            self.properties = dbus.Interface(
-                object,
-                'org.freedesktop.DBus.Properties'
-            )
-            self.player = dbus.Interface(object, 'org.mpris.MediaPlayer2.Player')
-            self.current_player = name
-            self.connected = True
+    @staticmethod
+    def decode_pil(image_data, size):
+        from PIL import Image
+        
+        with tracing.span('art.decode'):
+            image = Image.open(BytesIO(image_data))
+            image.draft('RGB', (size, size))
+            image = image.convert('RGB')
+        
+        with tracing.span('art.resize'):
+            image = image.resize((size, size), Image.Resampling.LANCZOS)
+        
+        # Pillow хранит RGB построчно по 4 байта на пиксель, поэтому RGBX
+        # выгружается одним memcpy на строку и сразу подходит для
+        # Format_RGBX8888 без конвертации внутри Qt
+        buffer = image.tobytes('raw', 'RGBX')
+        q_image = QImage(
+            buffer,
+            size, size,
+            size * 4,
+            QImage.Format.Format_RGBX8888
+        )
+        
+        return q_image, buffer
+    
+    
+    def load_artwork(self, art_url):
+        self.cancel()
+        self.pending = art_url
+        
+        if not art_url:
+            self.label.clear()
             
-            return True
-        except:
-            self.connected = False
+            return None
+        
+        cached = self.pixmaps.get(art_url)
+        
+        if cached is not None:
+            pixmap, mtime = cached
             
-            return False
+            if mtime is None or mtime == self.file_mtime(art_url):
+                tracing.count('art.memory_hits')
+                self.label.setPixmap(pixmap)
+                self.coloured.emit(art_url, self.palettes.get(art_url) or {})
+                
+                return None
+            
+            self.pixmaps.discard(art_url)
+        
+        self.pool.start(ArtTask(self, self.generation, art_url), 1)
+    
+    
+    def prefetch(self, art_url):
+        if not art_url or art_url in self.pixmaps or art_url in self.prefetching:
+            return None
+        
+        # Обложку, которая недавно не загрузилась, не запрашиваем на каждый
+        # сигнал фонового проигрывателя: задача занимала бы поток пула
+        failed_at = self.failed.get(art_url)
+        
+        if failed_at is not None and time.monotonic() - failed_at < self.retry_failed_after:
+            return None
+        
+        self.prefetching.add(art_url)
+        self.pool.start(ArtTask(self, None, art_url), 0)
     
     
-    def metadata(self):
-        if not self.properties or not self.connected:
-            return {}
+    @staticmethod
+    def file_mtime(art_url):
+        if not art_url.startswith('file://'):
+            return None
+        
         try:
-            metadata = self.properties.Get(
-                'org.mpris.MediaPlayer2.Player',
-                'Metadata'
-            )
+            return os.stat(unquote(art_url[7:])).st_mtime_ns
+        except OSError:
+            return None
+    
+    
+    def cancel(self):
+        # Очередь не очищаем, чтобы не терять предзагрузку: устаревшие
+        # задачи завершаются сразу при старте
+        self.generation += 1
+    
+    
+    def on_loaded(self, generation, image):
+        if generation != self.generation:
+            return None
+        
+        if image.isNull():
+            self.label.clear()
+        else:
+            pixmap = QPixmap.fromImage(image)
+            
+            self.pixmaps.put(self.pending, (pixmap, self.file_mtime(self.pending)))
+            self.label.setPixmap(pixmap)
+    
+    
+    def on_coloured(self, art_url, palette):
+        self.palettes.put(art_url, palette)
+    
+    
+    def on_prefetched(self, art_url, image):
+        self.prefetching.discard(art_url)
+        
+        if image.isNull():
+            self.failed.pop(art_url, None)
+            self.failed[art_url] = time.monotonic()
             
-            return {
-                'title': metadata.get('xesam:title', ''),
-                'artist': ', '.join(metadata.get('xesam:artist', [])),
-                'art': metadata.get('mpris:artUrl', ''),
-                'length': metadata.get('mpris:length', 0) / 1_000_000
-            }
-        except dbus.exceptions.DBusException as e:
-            if 'NoActivePlayer' in str(e) or 'No player' in str(e):
-                self.disconnect()
+            if len(self.failed) > self.max_failed:
+                del self.failed[next(iter(self.failed))]
             
-            return {}
-        except Exception:
-            return {}
+            return None
+        
+        self.failed.pop(art_url, None)
+        pixmap = QPixmap.fromImage(image)
+        
+        self.pixmaps.put(art_url, (pixmap, self.file_mtime(art_url)))
+        
+        if art_url == self.pending:
+            self.label.setPixmap(pixmap)
+
+
+class RenderCache:
+    # Запоминает последние показанные значения и трогает виджет только при
+    # их изменении: каждый лишний setText у полупрозрачного окна стоит
+    # перекомпоновки и перерисовки
+    def __init__(self, capacity=256):
+        self.values = {}
+        self.elided = {}
+        self.capacity = capacity
+        self.applied = 0
+        self.skipped = 0
     
     
-    def position(self):
-        try:
-            if not self.properties or not self.connected:
-                return 0
+    def apply(self, key, value, setter):
+        if key in self.values and self.values[key] == value:
+            self.skipped += 1
             
-            return self.properties.Get(
-                'org.mpris.MediaPlayer2.Player',
-                'Position'
-            ) / 1_000_000
-        except:
-            return 0
+            return False
+        
+        setter(value)
+        
+        self.values[key] = value
+        self.applied += 1
+        
+        return True
     
     
-    def status(self):
-        try:
-            if not self.properties or not self.connected:
-                return 'Stopped'
+    def elide(self, label, text):
+        font = label.font()
+        width = label.width()
+        key = (text, width, font.key())
+        elided = self.elided.get(key)
+        
+        if elided is None:
+            if len(self.elided) >= self.capacity:
+                self.elided.clear()
             
-            return str(
-                self.properties.Get(
-                    'org.mpris.MediaPlayer2.Player',
-                    'PlaybackStatus'
-                )
-            )
-        except:
-            return 'Stopped'
+            elided = QFontMetrics(font).elidedText(text, Qt.TextElideMode.ElideRight, width)
+            self.elided[key] = elided
+        
+        return elided
+
+
+class UpdateScheduler:
+    # Вместо постоянного опроса таймер заводится одним выстрелом к моменту,
+    # когда сменится показываемая секунда. На паузе, без проигрывателя и со
+    # скрытым окном он не заводится вовсе, а будят виджет сигналы шины.
+    # Таймер ползунка живёт здесь же, чтобы wakeups учитывал все пробуждения
+    margin_ms = 10
     
     
-    def play_pause(self):
-        if self.player and self.connected:
-            try:
-                self.player.PlayPause()
-            except:
-                self.connected = False
+    def __init__(self, parent, callback, progress):
+        self.callback = callback
+        self.progress = progress
+        self.wakeups = 0
+        
+        self.timer = QTimer(parent)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+        
+        # Прогресс между обновлениями экстраполируется локально, без
+        # обращений к шине
+        self.progress_timer = QTimer(parent)
+        self.progress_timer.timeout.connect(self.tick_progress)
     
     
-    def next(self):
-        if self.player and self.connected:
-            try:
-                self.player.Next()
-            except:
-                self.connected = False
+    def schedule(self, state, interval):
+        rate = abs(state.rate)
+        remaining = (1 - state.current_position() % 1) / rate
+        
+        self.timer.start(int(remaining * 1000) + self.margin_ms)
+        
+        if not self.progress_timer.isActive() or self.progress_timer.interval() != interval:
+            self.progress_timer.start(interval)
     
     
-    def prev(self):
-        if self.player and self.connected:
-            try:
-                self.player.Previous()
-            except:
-                self.connected = False
+    def stop(self):
+        self.timer.stop()
+        self.progress_timer.stop()
+    
+    
+    def tick(self):
+        self.wakeups += 1
+        tracing.count('ui.wakeup')
+        self.callback()
+    
+    
+    def tick_progress(self):
+        self.wakeups += 1
+        tracing.count('ui.wakeup')
+        self.progress()
+
+
+class SeekSlider(QSlider):
+    # Нажатие в любом месте дорожки сразу ставит позицию туда и начинает
+    # перетаскивание: ручка у ползунка невидимая
+    def value_at(self, event):
+        return QStyle.sliderValueFromPosition(
+            self.minimum(),
+            self.maximum(),
+            int(event.position().x()),
+            self.width()
+        )
+    
+    
+    def mousePressEvent(self, event):
+        if event.button() != Qt.MouseButton.LeftButton or not self.isEnabled():
+            return super().mousePressEvent(event)
+        
+        self.setSliderDown(True)
+        self.setSliderPosition(self.value_at(event))
+        event.accept()
+    
+    
+    def mouseMoveEvent(self, event):
+        if not self.isSliderDown():
+            return super().mouseMoveEvent(event)
+        
+        self.setSliderPosition(self.value_at(event))
+        event.accept()
+    
+    
+    def mouseReleaseEvent(self, event):
+        if not self.isSliderDown():
+            return super().mouseReleaseEvent(event)
+        
+        self.setSliderDown(False)
+        event.accept()
 
 
 class AudioPlayer(QWidget):
+    theme = {
+        'accent': '#9375f5',
+        'muted': '#aba3c7',
+        'background': 'rgba(32, 29, 42, 0.85)',
+        'text': '#efebff'
+    }
+    
+    # Все стили окна в одном шаблоне: смена палитры обходится одним
+    # setStyleSheet и одной перекомпоновкой стилей на трек
+    stylesheet = Template(
+        """
+        #art-box {
+            background-color: $background;
+            border-top-left-radius: 20px;
+            border-top-right-radius: 20px;
+        }
+        
+        #art {
+            background-color: $muted;
+            border-radius: 14px;
+        }
+        
+        #text-box, #slider-box {
+            background-color: $background;
+        }
+        
+        #text-box QLabel, #slider-box QLabel {
+            background: none;
+            color: $text;
+        }
+        
+        #title {
+            font-size: 14px;
+        }
+        
+        #artist {
+            font-size: 12px;
+        }
+        
+        #time, #duration {
+            font-size: 10px;
+        }
+        
+        QSlider {
+            background: none;
+        }
+        
+        QSlider::groove:horizontal {
+            height: 8px;
+            padding-left: 8px;
+            padding-right: 2px;
+            background-color: $muted;
+            border-radius: 4px;
+        }
+        
+        QSlider::sub-page:horizontal {
+            background-color: $accent;
+            border-radius: 4px;
+        }
+        
+        QSlider::add-page:horizontal {
+            background: none;
+        }
+        
+        QSlider::handle:horizontal {
+            background: none;
+        }
+        
+        #controls {
+            background-color: $background;
+            border-bottom-left-radius: 20px;
+            border-bottom-right-radius: 20px;
+        }
+        
+        QPushButton {
+            background-color: $accent;
+            border-radius: 14px;
+            color: $text;
+            font-size: 18px;
+        }
+        
+        QPushButton:hover {
+            background-color: $muted;
+        }
+        """
+    )
+    
+    
     def __init__(self):
         super().__init__()
         
@@ -269,66 +707,91 @@ class AudioPlayer(QWidget):
         )
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         
-        self.mpris = MPRIS()
+        self.resident = False
+        self.painted = False
+        self.render = RenderCache()
+        self.mpris = None
+        self.committed = None
         self.build_ui()
-        self.start_timer()
         # self.animate_open()
     
     
+    def start_services(self):
+        # Подключение к шине и первый опрос проигрывателей откладываются до
+        # первого кадра, чтобы каркас окна появлялся сразу
+        from mpris import MPRIS
+        
+        self.mpris = MPRIS(watch=True)
+        self.mpris.listeners.append(self.update_ui)
+        self.prev.clicked.connect(self.mpris.prev)
+        self.play.clicked.connect(self.mpris.play_pause)
+        self.next.clicked.connect(self.mpris.next)
+        self.start_timer()
+        
+        # Обложки остальных проигрывателей держим в кэше заранее, чтобы
+        # переключение между ними было мгновенным
+        self.mpris.registry.listeners.append(self.on_player_changed)
+        
+        for name in self.mpris.registry.owners:
+            self.on_player_changed(name)
+        
+        self.update_ui()
+    
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        
+        if not self.painted:
+            self.painted = True
+            tracing.first_frame()
+            QTimer.singleShot(0, self.start_services)
+    
+    
+    def present(self):
+        self.update_ui()
+        self.show()
+        self.raise_()
+        self.activateWindow()
+    
+    
+    def dismiss(self):
+        self.hide()
+    
+    
+    def toggle(self):
+        if self.isVisible():
+            self.hide()
+        else:
+            self.present()
+    
+    
     def build_ui(self):
         root = QVBoxLayout(self)
         root.setSpacing(0)
         
         art_container = QWidget()
         art_container.setObjectName('art-box')
-        art_container.setStyleSheet(
-            """
-            background-color: rgba(32, 29, 42, 0.85);
-            border-top-left-radius: 20px;
-            border-top-right-radius: 20px;
-            """
-        )
         art_layout = QVBoxLayout(art_container)
         art_layout.setContentsMargins(8, 8, 8, 0)
         self.art = QLabel()
+        self.art.setObjectName('art')
         self.art.setFixedSize(184, 184)
         self.art.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.art.setStyleSheet(
-            """
-            background-color: #aba3c7;
-            border-radius: 14px;
-            """
-        )
+        self.art_loader = AlbumArtLoader(self.art, cache=ArtCache())
         art_layout.addWidget(self.art)
         root.addWidget(art_container, alignment=Qt.AlignmentFlag.AlignCenter)
         
         text_box = QWidget()
         text_box.setObjectName('text-box')
         text_box.setFixedSize(200, 56)
-        text_box.setStyleSheet(
-            """
-            background-color: rgba(32, 29, 42, 0.85);
-            color: #efebff;
-            """
-        )
         text_l = QVBoxLayout(text_box)
         text_l.setContentsMargins(12, 12, 12, 12)
         self.title = QLabel('Нет подключения')
+        self.title.setObjectName('title')
         self.title.setFixedSize(176, 18)
-        self.title.setStyleSheet(
-            """
-            font-size: 14px;
-            background: none;
-            """
-        )
         self.artist = QLabel('')
+        self.artist.setObjectName('artist')
         self.artist.setFixedSize(176, 14)
-        self.artist.setStyleSheet(
-            """
-            font-size: 12px;
-            background: none;
-            """
-        )
         self.title.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.title.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
         self.title.setCursor(Qt.CursorShape.IBeamCursor)
@@ -343,57 +806,20 @@ class AudioPlayer(QWidget):
         slider_box.setObjectName('slider-box')
         slider_box.setFixedSize(200, 12)
         slider_box.setContentsMargins(4, 0, 0, 0)
-        slider_box.setStyleSheet(
-            """
-            background-color: rgba(32, 29, 42, 0.85);
-            color: #efebff;
-            """
-        )
         slider_l = QHBoxLayout(slider_box)
         slider_l.setContentsMargins(12, 0, 12, 0)
         self.time = QLabel('0:00')
-        self.time.setStyleSheet(
-            """
-            background: none;
-            font-size: 10px;
-            """
-        )
+        self.time.setObjectName('time')
         self.duration = QLabel('0:00')
-        self.duration.setStyleSheet(
-            """
-            background: none;
-            font-size: 10px;
-            """
-        )
-        self.slider = QSlider(Qt.Orientation.Horizontal)
+        self.duration.setObjectName('duration')
+        # Диапазон ползунка в миллисекундах, чтобы прогресс двигался
+        # плавно, а не секундными скачками
+        self.slider = SeekSlider(Qt.Orientation.Horizontal)
         self.slider.setEnabled(False)
-        self.slider.setStyleSheet(
-            """
-            QSlider {
-                background: none;
-            }
-            QSlider::groove:horizontal {
-                height: 8px;
-                padding-left: 8px;
-                padding-right: 2px;
-                background-color: #aba3c7;
-                border-radius: 4px;
-            }
-            
-            QSlider::sub-page:horizontal {
-                background-color: #9375f5;
-                border-radius: 4px;
-            }
-            
-            QSlider::add-page:horizontal {
-                background: none;
-            }
-            
-            QSlider::handle:horizontal {
-                background: none;
-            }
-            """
-        )
+        self.slider.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.slider.sliderPressed.connect(self.on_slider_pressed)
+        self.slider.sliderMoved.connect(self.on_slider_moved)
+        self.slider.sliderReleased.connect(self.on_slider_released)
         slider_l.addWidget(self.time)
         slider_l.addWidget(self.slider, 1)
         slider_l.addWidget(self.duration)
@@ -402,13 +828,6 @@ class AudioPlayer(QWidget):
         controls = QWidget()
         controls.setObjectName('controls')
         controls.setFixedSize(200, 72)
-        controls.setStyleSheet(
-            """
-            background-color: rgba(32, 29, 42, 0.85);
-            border-bottom-left-radius: 20px;
-            border-bottom-right-radius: 20px;
-            """
-        )
         cl = QHBoxLayout(controls)
         cl.setContentsMargins(0, 0, 0, 0)
         cl.setSpacing(0)
@@ -421,34 +840,24 @@ class AudioPlayer(QWidget):
             button.setFixedSize(56, 56)
             button.setCursor(Qt.CursorShape.PointingHandCursor)
             button.setContentsMargins(8, 0, 0, 0)
-            button.setStyleSheet(
-                """
-                QPushButton {
-                    background-color: #9375f5;
-                    border-radius: 14px;
-                    color: #efebff;
-                    font-size: 18px;
-                }
-                
-                QPushButton:hover {
-                    background-color: #aba3c7;
-                }
-                """
-            )
         
-        self.prev.clicked.connect(self.mpris.prev)
-        self.play.clicked.connect(self.mpris.play_pause)
-        self.next.clicked.connect(self.mpris.next)
         cl.addWidget(self.prev)
         cl.addWidget(self.play)
         cl.addWidget(self.next)
         root.addWidget(controls)
+        
+        self.art_loader.coloured.connect(self.on_coloured)
+        self.apply_palette(None)
     
     
     def start_timer(self):
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_ui)
-        self.timer.start(500)
+        self.scheduler = UpdateScheduler(self, self.update_ui, self.on_progress)
+        
+        # Перетаскивание сводится к одному SetPosition после паузы
+        self.seek_timer = QTimer(self)
+        self.seek_timer.setSingleShot(True)
+        self.seek_timer.setInterval(150)
+        self.seek_timer.timeout.connect(self.commit_seek)
     
     
     """def animate_open(self):
@@ -482,76 +891,239 @@ class AudioPlayer(QWidget):
         pass
     
     
+    @tracing.traced('ui.update')
     def update_ui(self):
-        def set_elided_text(label: QLabel, text: str):
-            font_metrics = QFontMetrics(label.font())
-            elided_text = font_metrics.elidedText(text, Qt.TextElideMode.ElideRight, label.width())
-            label.setText(elided_text)
+        render = self.render
+        
+        if self.mpris is None:
+            return None
         
         if not self.mpris.connected or not self.mpris.current_player:
-            players = self.mpris.get_players()
-            connected = False
-            
-            for p in players:
-                if self.mpris.connect(p):
-                    connected = True
-                    
-                    break
-            
-            if not connected:
-                self.title.setText('Нет активного проигрывателя')
-                self.artist.setText('')
-                self.art.clear()
-                self.time.setText('0:00')
-                self.duration.setText('0:00')
+            if not self.mpris.connect_any():
+                render.apply('title', 'Нет активного проигрывателя', self.title.setText)
+                render.apply('artist', '', self.artist.setText)
+                render.apply('art', None, self.show_art)
+                render.apply('time', '0:00', self.time.setText)
+                render.apply('duration', '0:00', self.duration.setText)
+                render.apply('seekable', False, self.slider.setEnabled)
+                render.apply('play', '', self.play.setText)
                 self.slider.setValue(0)
-                self.play.setText('')
+                self.update_progress()
                 
                 return None
         
         try:
-            metadata = self.mpris.metadata()
+            state = self.mpris.snapshot()
             
-            if not metadata:
+            if state is None:
                 self.mpris.connected = False
-                self.title.setText('Нет активного проигрывателя')
-                self.artist.setText('')
+                render.apply('title', 'Нет активного проигрывателя', self.title.setText)
+                render.apply('artist', '', self.artist.setText)
                 
                 return None
             
-            set_elided_text(self.title, metadata.get('title', 'Без названия') or 'Без названия')
-            set_elided_text(self.artist, metadata.get('artist', 'Неизвестный исполнитель') or 'Неизвестный исполнитель')
+            title = render.elide(self.title, state.title or 'Без названия')
+            artist = render.elide(self.artist, state.artist or 'Неизвестный исполнитель')
             
-            if metadata.get('art') != self.mpris.last_art:
-                self.mpris.last_art = metadata.get('art')
-                AlbumArtLoader.load_artwork(metadata.get('art'), self.art)
+            render.apply('title', title, self.title.setText)
+            render.apply('artist', artist, self.artist.setText)
+            render.apply('art', state.art, self.show_art)
+            render.apply('upcoming', (self.mpris.current_player, state.track_id), self.prefetch_upcoming)
+            render.apply('player', self.mpris.current_player, self.show_player)
             
-            position = self.mpris.position()
-            duration = metadata.get('length', 0)
+            position = int(state.current_position())
+            duration = int(state.length)
+            
+            render.apply('seekable', bool(duration and state.can_seek), self.slider.setEnabled)
             
             if duration:
-                self.slider.setRange(0, int(duration))
-                self.slider.setValue(int(position))
-                self.time.setText(f'{int(position)//60}:{int(position)%60:02d}')
-                self.duration.setText(f'{int(duration)//60}:{int(duration)%60:02d}')
+                render.apply('range', duration * 1000, lambda value: self.slider.setRange(0, value))
+                render.apply('duration', f'{duration//60}:{duration%60:02d}', self.duration.setText)
+                
+                # Пока ползунок тянут, позицию показывает он сам
+                if not self.slider.isSliderDown():
+                    render.apply('time', f'{position//60}:{position%60:02d}', self.time.setText)
+                    self.on_progress()
             
-            status = self.mpris.status()
-            self.play.setText('' if status == 'Playing' else '')
+            render.apply(
+                'play',
+                '' if state.status == 'Playing' else '',
+                self.play.setText
+            )
+            self.update_progress()
             
         except Exception as exception:
-            print(exception)
+            import traceback
+            
+            tracing.error('ui', exception)
             traceback.print_exc()
             
             self.mpris.connected = False
     
     
+    def update_progress(self):
+        state = self.mpris.state if self.mpris else None
+        maximum = self.slider.maximum()
+        
+        if state is None or state.status != 'Playing' or not state.rate or not maximum or not self.isVisible():
+            self.scheduler.stop()
+            
+            return None
+        
+        # Один шаг таймера на пиксель дорожки, но не чаще 60 кадров в секунду
+        interval = max(16, int(maximum / abs(state.rate) / max(1, self.slider.width())))
+        
+        self.scheduler.schedule(state, interval)
+    
+    
+    def on_progress(self):
+        state = self.mpris.state if self.mpris else None
+        
+        if state is None or self.slider.isSliderDown() or self.seek_timer.isActive():
+            return None
+        
+        self.slider.setValue(int(state.current_position() * 1000))
+    
+    
+    def on_slider_pressed(self):
+        self.committed = None
+    
+    
+    def on_slider_moved(self, value):
+        seconds = value // 1000
+        
+        self.render.apply('time', f'{seconds//60}:{seconds%60:02d}', self.time.setText)
+        self.seek_timer.start()
+    
+    
+    def on_slider_released(self):
+        # Если пауза в перетаскивании уже отправила эту позицию, второй
+        # SetPosition не нужен
+        if self.seek_timer.isActive() or self.slider.value() != self.committed:
+            self.seek_timer.stop()
+            self.commit_seek()
+    
+    
+    def commit_seek(self):
+        value = self.slider.value()
+        
+        if self.mpris is not None and value != self.committed:
+            self.committed = value
+            self.mpris.set_position(value / 1000)
+            self.update_ui()
+    
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        
+        if self.mpris is not None:
+            self.update_progress()
+    
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        
+        if self.mpris is not None:
+            self.scheduler.stop()
+    
+    
+    def on_player_changed(self, name):
+        state = self.mpris.registry.states.get(name)
+        
+        if state is not None and name != self.mpris.current_player:
+            self.art_loader.prefetch(state.art)
+    
+    
+    def prefetch_upcoming(self, key):
+        self.mpris.upcoming(self.prefetch_art)
+    
+    
+    def prefetch_art(self, art_urls):
+        # Обложки соседних треков готовятся с низким приоритетом, чтобы
+        # next/prev сразу показывали нужную картинку
+        for art_url in art_urls:
+            self.art_loader.prefetch(art_url)
+    
+    
+    def switch_player(self, step):
+        if self.mpris and self.mpris.cycle(step):
+            self.update_ui()
+    
+    
+    def show_art(self, art_url):
+        self.art_loader.load_artwork(art_url)
+        
+        # Без обложки возвращаемся к стандартным цветам, иначе палитра
+        # придёт вместе с картинкой
+        if not art_url:
+            self.apply_palette(None)
+    
+    
+    def on_coloured(self, art_url, palette):
+        if art_url == self.art_loader.pending:
+            self.apply_palette(palette)
+    
+    
+    def apply_palette(self, palette):
+        self.render.apply(
+            'theme',
+            dict(self.theme, **(palette or {})),
+            lambda theme: self.setStyleSheet(self.stylesheet.substitute(theme))
+        )
+    
+    
+    def show_player(self, name):
+        players = sorted(self.mpris.get_players())
+        label = name.removeprefix('org.mpris.MediaPlayer2.')
+        
+        if len(players) > 1 and name in players:
+            label = f'{label} ({players.index(name) + 1}/{len(players)})'
+        
+        self.setToolTip(label)
+    
+    
+    def wheelEvent(self, event):
+        delta = event.angleDelta().y()
+        
+        if delta:
+            self.switch_player(-1 if delta > 0 else 1)
+    
+    
     def keyPressEvent(self, event):
         if event.key() == Qt.Key.Key_Escape:
-            QApplication.quit()
+            if self.resident:
+                self.hide()
+            else:
+                QApplication.quit()
+        
+        elif event.key() == Qt.Key.Key_Left:
+            self.switch_player(-1)
+        
+        elif event.key() == Qt.Key.Key_Right:
+            self.switch_player(1)
 
 
 if __name__ == '__main__':
+    # Повторный запуск передаёт свою команду живому экземпляру и выходит
+    # ещё до создания QApplication
+    lock = instance.claim('audio_player', instance.requested(sys.argv))
+    
     application = QApplication(sys.argv)
+    tracing.install()
     widget = AudioPlayer()
+    server = ControlServer('audio_player', {
+        'show': widget.present,
+        'hide': widget.dismiss,
+        'toggle': widget.toggle,
+        'quit': application.quit
+    })
+    application.aboutToQuit.connect(server.close)
+    
+    # В резидентном режиме процесс остаётся жить со скрытым окном,
+    # а клики по модулю waybar переключают его через управляющий сокет
+    if '--resident' in sys.argv:
+        widget.resident = True
+        application.setQuitOnLastWindowClosed(False)
+    
     widget.show()
     sys.exit(application.exec())
@@ -0,0 +1,80 @@
+import sys
+import time
+import argparse
+
+from io import BytesIO
+from functools import lru_cache
+from PIL import Image
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+@lru_cache(maxsize=64)
+def render(track, size):
+    image = Image.new('RGB', (size, size), ((track * 53) % 256, (track * 97) % 256, 160))
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    
+    return buffer.getvalue()
+
+
+class ArtHandler(BaseHTTPRequestHandler):
+    # /art/<track>.jpg?size=<px>&delay=<s>: медленные и огромные обложки
+    # для проверки загрузчика
+    protocol_version = 'HTTP/1.1'
+    
+    
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        
+        try:
+            track = int(url.path.rsplit('/', 1)[-1].split('.')[0])
+        except ValueError:
+            self.send_error(404)
+            
+            return None
+        
+        size = int(query.get('size', ['600'])[0])
+        delay = float(query.get('delay', ['0'])[0])
+        etag = f'"{track}-{size}"'
+        
+        time.sleep(delay)
+        
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            
+            return None
+        
+        data = render(track, size)
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(data)
+    
+    
+    def log_message(self, format, *arguments):
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=0)
+    arguments = parser.parse_args()
+    
+    server = ThreadingHTTPServer(('127.0.0.1', arguments.port), ArtHandler)
+    server.daemon_threads = True
+    
+    # Стенд читает фактический порт из первой строки вывода
+    print(server.server_address[1], flush=True)
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,67 @@
+import sys
+import dbus
+import argparse
+import dbus.service
+
+from collections import Counter
+from dbus.mainloop.glib import DBusGMainLoop
+from PyQt6.QtCore import QCoreApplication
+
+
+class FakeLogin1(dbus.service.Object):
+    # Поддельный org.freedesktop.login1.Manager для проверки действий меню
+    # на отдельной шине: ничего не выключает, только считает вызовы
+    def __init__(self, bus, fail=False):
+        self.bus_name = dbus.service.BusName('org.freedesktop.login1', bus)
+        
+        super().__init__(self.bus_name, '/org/freedesktop/login1')
+        
+        self.fail = fail
+        self.calls = Counter()
+    
+    
+    def handle(self, method):
+        self.calls[method] += 1
+        
+        if self.fail:
+            raise dbus.exceptions.DBusException(
+                f'{method} denied by fake login1',
+                name='org.freedesktop.DBus.Error.AccessDenied'
+            )
+    
+    
+    @dbus.service.method('org.freedesktop.login1.Manager', in_signature='b')
+    def PowerOff(self, interactive):
+        self.handle('PowerOff')
+    
+    
+    @dbus.service.method('org.freedesktop.login1.Manager', in_signature='b')
+    def Reboot(self, interactive):
+        self.handle('Reboot')
+    
+    
+    @dbus.service.method('org.freedesktop.login1.Manager', in_signature='s')
+    def LockSession(self, session):
+        self.handle('LockSession')
+    
+    
+    @dbus.service.method('org.freedesktop.login1.Manager')
+    def LockSessions(self):
+        self.handle('LockSessions')
+    
+    
+    @dbus.service.method('org.soft_dots.Bench', out_signature='a{su}')
+    def Calls(self):
+        return dbus.Dictionary(self.calls, signature='su')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--fail', action='store_true')
+    arguments = parser.parse_args()
+    
+    DBusGMainLoop(set_as_default=True)
+    
+    application = QCoreApplication(sys.argv)
+    service = FakeLogin1(dbus.SessionBus(), arguments.fail)
+    sys.exit(application.exec())
@@ -0,0 +1,217 @@
+import sys
+import time
+import dbus
+import argparse
+import dbus.service
+
+from collections import Counter
+from dbus.mainloop.glib import DBusGMainLoop
+from PyQt6.QtCore import QCoreApplication, QTimer
+
+
+class FakePlayer(dbus.service.Object):
+    # Сценарный org.mpris.MediaPlayer2 для стенда: меняет треки с заданной
+    # частотой и считает входящие вызовы, чтобы стенд мог оценить нагрузку
+    # виджета на шину
+    def __init__(self, bus, name, art, length, status, track_list=False):
+        self.bus_name = dbus.service.BusName(f'org.mpris.MediaPlayer2.{name}', bus)
+        
+        super().__init__(self.bus_name, '/org/mpris/MediaPlayer2')
+        
+        self.art = art
+        self.length = length
+        self.status = status
+        self.track_list = track_list
+        self.track = 0
+        self.offset = 0
+        self.stamp = time.monotonic()
+        self.calls = Counter()
+    
+    
+    def position(self):
+        position = self.offset
+        
+        if self.status == 'Playing':
+            position += time.monotonic() - self.stamp
+        
+        return dbus.Int64(int(min(position, self.length) * 1_000_000))
+    
+    
+    def metadata(self, track=None):
+        track = self.track if track is None else track
+        
+        return dbus.Dictionary({
+            'mpris:trackid': dbus.ObjectPath(f'/org/soft_dots/track/{track}'),
+            'mpris:length': dbus.Int64(int(self.length * 1_000_000)),
+            'mpris:artUrl': self.art.format(track=track),
+            'xesam:title': f'Track {track}',
+            'xesam:artist': dbus.Array(['Fake Artist'], signature='s')
+        }, signature='sv')
+    
+    
+    def player_properties(self):
+        return {
+            'PlaybackStatus': self.status,
+            'Metadata': self.metadata(),
+            'Position': self.position(),
+            'Rate': 1.0,
+            'CanSeek': True,
+            'CanGoNext': True,
+            'CanGoPrevious': True,
+            'CanPlay': True,
+            'CanPause': True,
+            'CanControl': True
+        }
+    
+    
+    def properties(self, interface):
+        if interface == 'org.mpris.MediaPlayer2.Player':
+            return self.player_properties()
+        
+        if interface == 'org.mpris.MediaPlayer2':
+            return {
+                'Identity': self.bus_name.get_name(),
+                'CanQuit': False,
+                'CanRaise': False,
+                'HasTrackList': self.track_list
+            }
+        
+        if interface == 'org.mpris.MediaPlayer2.TrackList' and self.track_list:
+            return {
+                'Tracks': dbus.Array(
+                    [
+                        dbus.ObjectPath(f'/org/soft_dots/track/{track}')
+                        for track in range(max(0, self.track - 5), self.track + 6)
+                    ],
+                    signature='o'
+                ),
+                'CanEditTracks': False
+            }
+        
+        raise dbus.exceptions.DBusException(
+            f'Unknown interface {interface}',
+            name='org.freedesktop.DBus.Error.UnknownInterface'
+        )
+    
+    
+    @dbus.service.method('org.freedesktop.DBus.Properties', in_signature='ss', out_signature='v')
+    def Get(self, interface, name):
+        self.calls['Get'] += 1
+        
+        return self.properties(interface)[name]
+    
+    
+    @dbus.service.method('org.freedesktop.DBus.Properties', in_signature='s', out_signature='a{sv}')
+    def GetAll(self, interface):
+        self.calls['GetAll'] += 1
+        
+        return dbus.Dictionary(self.properties(interface), signature='sv')
+    
+    
+    @dbus.service.method('org.freedesktop.DBus.Properties', in_signature='ssv')
+    def Set(self, interface, name, value):
+        self.calls['Set'] += 1
+    
+    
+    @dbus.service.signal('org.freedesktop.DBus.Properties', signature='sa{sv}as')
+    def PropertiesChanged(self, interface, changed, invalidated):
+        pass
+    
+    
+    @dbus.service.signal('org.mpris.MediaPlayer2.Player', signature='x')
+    def Seeked(self, position):
+        pass
+    
+    
+    @dbus.service.method('org.mpris.MediaPlayer2.Player')
+    def PlayPause(self):
+        self.calls['PlayPause'] += 1
+        self.set_status('Paused' if self.status == 'Playing' else 'Playing')
+    
+    
+    @dbus.service.method('org.mpris.MediaPlayer2.Player')
+    def Next(self):
+        self.calls['Next'] += 1
+        self.advance(1)
+    
+    
+    @dbus.service.method('org.mpris.MediaPlayer2.Player')
+    def Previous(self):
+        self.calls['Previous'] += 1
+        self.advance(-1)
+    
+    
+    @dbus.service.method('org.mpris.MediaPlayer2.Player', in_signature='ox')
+    def SetPosition(self, track_id, position):
+        self.calls['SetPosition'] += 1
+        
+        if track_id != self.metadata()['mpris:trackid']:
+            return None
+        
+        self.offset = position / 1_000_000
+        self.stamp = time.monotonic()
+        self.Seeked(self.position())
+    
+    
+    @dbus.service.method('org.mpris.MediaPlayer2.TrackList', in_signature='ao', out_signature='aa{sv}')
+    def GetTracksMetadata(self, tracks):
+        self.calls['GetTracksMetadata'] += 1
+        
+        return [self.metadata(int(track.rsplit('/', 1)[-1])) for track in tracks]
+    
+    
+    @dbus.service.method('org.soft_dots.Bench', out_signature='a{su}')
+    def Calls(self):
+        return dbus.Dictionary(self.calls, signature='su')
+    
+    
+    def set_status(self, status):
+        self.offset = self.position() / 1_000_000
+        self.stamp = time.monotonic()
+        self.status = status
+        self.PropertiesChanged(
+            'org.mpris.MediaPlayer2.Player',
+            {'PlaybackStatus': status},
+            []
+        )
+    
+    
+    def advance(self, step=1):
+        self.track = max(0, self.track + step)
+        self.offset = 0
+        self.stamp = time.monotonic()
+        self.PropertiesChanged(
+            'org.mpris.MediaPlayer2.Player',
+            {'Metadata': self.metadata()},
+            []
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--name', default='bench')
+    parser.add_argument('--art', default='')
+    parser.add_argument('--length', type=float, default=180)
+    parser.add_argument('--status', default='Playing')
+    parser.add_argument('--change-every', type=float, default=0)
+    parser.add_argument('--track-list', action='store_true')
+    arguments = parser.parse_args()
+    
+    DBusGMainLoop(set_as_default=True)
+    
+    application = QCoreApplication(sys.argv)
+    player = FakePlayer(
+        dbus.SessionBus(),
+        arguments.name,
+        arguments.art,
+        arguments.length,
+        arguments.status,
+        arguments.track_list
+    )
+    
+    if arguments.change_every:
+        timer = QTimer()
+        timer.timeout.connect(player.advance)
+        timer.start(int(arguments.change_every * 1000))
+    
+    sys.exit(application.exec())
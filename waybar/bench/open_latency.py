@@ -0,0 +1,75 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+sys.path.insert(0, ROOT)
+
+from control import send
+
+
+def measure(arguments):
+    report = os.path.join(tempfile.mkdtemp(prefix='soft_dots-open-'), 'trace.json')
+    
+    # Свой runtime-каталог, чтобы стенд не достучался до живого меню через
+    # блокировку и сокет. send() читает его из окружения этого процесса
+    os.environ['XDG_RUNTIME_DIR'] = tempfile.mkdtemp(prefix='soft_dots-runtime-')
+    environment = dict(
+        os.environ,
+        QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'),
+        SOFT_DOTS_TRACE=report
+    )
+    environment.pop('SOFT_DOTS_FIRST_FRAME', None)
+    menu = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'power_menu.py'), '--resident'],
+        cwd=ROOT,
+        env=environment
+    )
+    deadline = time.monotonic() + 10
+    
+    while not send('power_menu', 'ping'):
+        if time.monotonic() > deadline or menu.poll() is not None:
+            menu.kill()
+            raise RuntimeError('power_menu did not start')
+        
+        time.sleep(0.05)
+    
+    # Первое открытие уже прошло при запуске, дальше меряем только
+    # открытия прогретого резидентного окна
+    for _ in range(arguments.runs):
+        send('power_menu', 'hide')
+        time.sleep(arguments.pause)
+        send('power_menu', 'show')
+        time.sleep(arguments.pause)
+    
+    send('power_menu', 'quit')
+    menu.wait(timeout=10)
+    
+    with open(report) as file:
+        return json.load(file)['histograms'].get('menu.open')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Measure how fast the resident power menu opens on a toggle'
+    )
+    parser.add_argument('--runs', type=int, default=30)
+    parser.add_argument('--pause', type=float, default=0.6)
+    parser.add_argument('--budget-ms', type=float, default=16)
+    arguments = parser.parse_args()
+    
+    histogram = measure(arguments)
+    
+    if histogram is None:
+        print('no menu.open samples recorded', file=sys.stderr)
+        sys.exit(1)
+    
+    print(json.dumps(histogram, indent=4))
+    sys.exit(0 if histogram['p90_ms'] <= arguments.budget_ms else 1)
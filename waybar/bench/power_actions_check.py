@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import socket
+import tempfile
+import argparse
+import threading
+import subprocess
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+def fake_hyprland(path, fail):
+    # Сокет в формате Hyprland: на команду отвечает ok или текстом ошибки
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(4)
+    commands = []
+    
+    
+    def serve():
+        while True:
+            connection, _ = server.accept()
+            
+            with connection:
+                command = connection.recv(4096).decode()
+                commands.append(command)
+                connection.sendall(b'fake hyprland refused' if fail else b'ok')
+    
+    
+    threading.Thread(target=serve, daemon=True).start()
+    
+    return commands
+
+
+def check(fail):
+    import dbus
+    
+    from power_actions import HyprlandBackend, Login1Backend, PowerActions
+    
+    login1 = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, 'fake_login1.py'), *(['--fail'] if fail else [])]
+    )
+    bus = dbus.SessionBus()
+    deadline = time.monotonic() + 10
+    
+    while 'org.freedesktop.login1' not in bus.list_names():
+        if time.monotonic() > deadline:
+            login1.kill()
+            raise RuntimeError('fake login1 did not start')
+        
+        time.sleep(0.05)
+    
+    path = os.path.join(tempfile.mkdtemp(prefix='soft_dots-hypr-'), '.socket.sock')
+    commands = fake_hyprland(path, fail)
+    actions = PowerActions(login1=Login1Backend(bus), hyprland=HyprlandBackend(path))
+    results = {action: actions.run(action) for action in PowerActions.actions}
+    calls = dict(
+        bus.get_object('org.freedesktop.login1', '/org/freedesktop/login1').Calls(
+            dbus_interface='org.soft_dots.Bench'
+        )
+    )
+    
+    login1.terminate()
+    login1.wait()
+    
+    # Каждое действие должно дойти до своего бэкенда ровно один раз и
+    # вернуть ошибку тогда и только тогда, когда бэкенд отказал
+    ok = (
+        calls == {'PowerOff': 1, 'Reboot': 1}
+        and commands == ['dispatch exec hyprlock', 'dispatch exit']
+        and all((error is not None) == fail for error in results.values())
+    )
+    
+    for action, error in results.items():
+        print(f'{"fail" if fail else "ok"}: {action}: {error or "ok"}')
+    
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Check the power menu actions against fake login1 and Hyprland'
+    )
+    parser.add_argument('--inner', action='store_true', help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+    
+    if not arguments.inner:
+        sys.exit(subprocess.call([
+            'dbus-run-session', '--',
+            sys.executable, os.path.abspath(__file__), '--inner'
+        ]))
+    
+    sys.exit(0 if check(False) and check(True) else 1)
@@ -0,0 +1,251 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+def percentiles(values, points=(50, 90, 99)):
+    if not values:
+        return {f'p{point}': None for point in points}
+    
+    ordered = sorted(values)
+    
+    return {
+        f'p{point}': ordered[min(len(ordered) - 1, len(ordered) * point // 100)]
+        for point in points
+    }
+
+
+def rss():
+    with open('/proc/self/status') as file:
+        for line in file:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) * 1024
+    
+    return 0
+
+
+def revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=HERE,
+            stderr=subprocess.DEVNULL,
+            text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def spawn(arguments):
+    port_reader = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, 'art_server.py')],
+        stdout=subprocess.PIPE,
+        text=True
+    )
+    port = int(port_reader.stdout.readline())
+    art = (
+        f'http://127.0.0.1:{port}/art/{{track}}.jpg'
+        f'?size={arguments.art_size}&delay={arguments.art_delay}'
+    )
+    children = [port_reader]
+    
+    for index in range(arguments.players):
+        children.append(subprocess.Popen([
+            sys.executable,
+            os.path.join(HERE, 'fake_player.py'),
+            '--name', f'bench{index}',
+            '--art', art,
+            '--change-every', str(arguments.change_every),
+            '--status', 'Playing' if index == 0 else 'Paused',
+            *(['--track-list'] if arguments.track_list else [])
+        ]))
+    
+    return children
+
+
+def measure(arguments):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    os.environ['XDG_CACHE_HOME'] = tempfile.mkdtemp(prefix='soft_dots-bench-')
+    
+    import dbus
+    
+    from dbus.mainloop.glib import DBusGMainLoop
+    from PyQt6.QtCore import QTimer
+    from PyQt6.QtWidgets import QApplication
+    
+    # Главный цикл нужно назначить до первого SessionBus, иначе общее
+    # подключение останется без сигналов
+    DBusGMainLoop(set_as_default=True)
+    
+    children = spawn(arguments)
+    bus = dbus.SessionBus()
+    names = [f'org.mpris.MediaPlayer2.bench{index}' for index in range(arguments.players)]
+    deadline = time.monotonic() + 10
+    
+    while time.monotonic() < deadline:
+        if set(names) <= set(bus.list_names()):
+            break
+        
+        time.sleep(0.05)
+    
+    from audio_player import AudioPlayer
+    
+    
+    class ProbedPlayer(AudioPlayer):
+        def __init__(self):
+            super().__init__()
+            
+            self.update_times = []
+        
+        
+        def update_ui(self):
+            start = time.perf_counter()
+            
+            super().update_ui()
+            
+            self.update_times.append((time.perf_counter() - start) * 1000)
+    
+    
+    def calls():
+        total = 0
+        
+        for name in names:
+            try:
+                counts = bus.get_object(name, '/org/mpris/MediaPlayer2').Calls(
+                    dbus_interface='org.soft_dots.Bench'
+                )
+                total += sum(counts.values())
+            except dbus.exceptions.DBusException:
+                pass
+        
+        return total
+    
+    application = QApplication(sys.argv[:1])
+    rss_start = rss()
+    started = time.perf_counter()
+    widget = ProbedPlayer()
+    widget.show()
+    startup = (time.perf_counter() - started) * 1000
+    
+    art_started = {}
+    art_latency = []
+    stalls = []
+    rss_samples = []
+    heartbeat = {'last': time.perf_counter()}
+    interval = 10
+    
+    
+    def on_art_requested(art_url, load=widget.art_loader.load_artwork):
+        art_started[widget.art_loader.generation + 1] = time.perf_counter()
+        load(art_url)
+    
+    
+    def on_art_loaded(generation, image):
+        if generation in art_started:
+            art_latency.append((time.perf_counter() - art_started.pop(generation)) * 1000)
+    
+    
+    def on_heartbeat():
+        now = time.perf_counter()
+        lateness = (now - heartbeat['last']) * 1000 - interval
+        heartbeat['last'] = now
+        
+        # Опоздание тика больше одного интервала считаем блокировкой
+        # GUI-потока
+        if lateness > interval:
+            stalls.append(lateness)
+    
+    
+    widget.art_loader.load_artwork = on_art_requested
+    widget.art_loader.loaded.connect(on_art_loaded)
+    
+    ticker = QTimer()
+    ticker.timeout.connect(on_heartbeat)
+    ticker.start(interval)
+    
+    sampler = QTimer()
+    sampler.timeout.connect(lambda: rss_samples.append(rss()))
+    sampler.start(1000)
+    
+    calls_start = calls()
+    QTimer.singleShot(int(arguments.duration * 1000), application.quit)
+    measured = time.perf_counter()
+    application.exec()
+    elapsed = time.perf_counter() - measured
+    calls_end = calls()
+    
+    for child in children:
+        child.terminate()
+    
+    for child in children:
+        child.wait()
+    
+    return {
+        'revision': revision(),
+        'parameters': vars(arguments),
+        'startup_ms': startup,
+        'dbus_calls_per_second': (calls_end - calls_start) / elapsed,
+        'update_ui_ms': dict(
+            percentiles(widget.update_times),
+            count=len(widget.update_times)
+        ),
+        'gui_stall_ms': {
+            'total': sum(stalls),
+            'max': max(stalls, default=0),
+            'count': len(stalls)
+        },
+        'rss_bytes': {
+            'start': rss_start,
+            'end': rss_samples[-1] if rss_samples else rss(),
+            'growth': (rss_samples[-1] if rss_samples else rss()) - rss_start
+        },
+        'art_latency_ms': dict(percentiles(art_latency), count=len(art_latency)),
+        'ui_wakeups': {
+            'total': widget.scheduler.wakeups,
+            'per_second': widget.scheduler.wakeups / elapsed
+        },
+        'render_skipped': widget.render.skipped,
+        'render_applied': widget.render.applied
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Benchmark and soak the MPRIS widget against fake players'
+    )
+    parser.add_argument('--players', type=int, default=3)
+    parser.add_argument('--change-every', type=float, default=5)
+    parser.add_argument('--art-size', type=int, default=600)
+    parser.add_argument('--art-delay', type=float, default=0)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--track-list', action='store_true')
+    parser.add_argument('--output', default='-')
+    parser.add_argument('--inner', action='store_true', help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+    
+    # Стенд всегда работает на собственной шине, чтобы не трогать
+    # проигрыватели пользователя
+    if not arguments.inner:
+        sys.exit(subprocess.call([
+            'dbus-run-session', '--',
+            sys.executable, os.path.abspath(__file__), '--inner', *sys.argv[1:]
+        ]))
+    
+    del arguments.inner
+    
+    result = json.dumps(measure(arguments), indent=4)
+    
+    if arguments.output == '-':
+        print(result)
+    else:
+        with open(arguments.output, 'w') as file:
+            file.write(result + '\n')
@@ -0,0 +1,151 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+TARGETS = {
+    'audio_player': ['audio_player.py'],
+    'power_menu': ['power_menu.py']
+}
+
+
+def parse_importtime(stderr):
+    # Строки -X importtime: "import time: self | cumulative | name", вложенные
+    # импорты сдвинуты пробелами, поэтому верхний уровень без отступа
+    modules = {}
+    
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        
+        fields = line[len('import time:'):].split('|')
+        
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        
+        name = fields[2][1:].rstrip()
+        
+        if name == name.lstrip():
+            modules[name] = int(fields[1]) / 1000
+    
+    return modules
+
+
+def run_once(target):
+    # Свой runtime-каталог, чтобы запущенный экземпляр не перехватил
+    # запуск через блокировку и сокет
+    environment = dict(
+        os.environ,
+        QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'),
+        XDG_RUNTIME_DIR=tempfile.mkdtemp(prefix='soft_dots-startup-'),
+        SOFT_DOTS_FIRST_FRAME='1'
+    )
+    started = time.time()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', *TARGETS[target]],
+        cwd=ROOT,
+        env=environment,
+        capture_output=True,
+        text=True,
+        timeout=30
+    )
+    
+    for line in result.stdout.splitlines():
+        if line.startswith('first-frame '):
+            return (float(line.split()[1]) - started) * 1000, parse_importtime(result.stderr)
+    
+    raise RuntimeError(f'{target} exited with {result.returncode} before the first frame')
+
+
+def measure(target, runs):
+    frames = []
+    imports = {}
+    
+    for _ in range(runs):
+        frame, modules = run_once(target)
+        frames.append(frame)
+        
+        for name, cumulative in modules.items():
+            imports.setdefault(name, []).append(cumulative)
+    
+    slowest = sorted(
+        ((name, statistics.median(values)) for name, values in imports.items()),
+        key=lambda item: item[1],
+        reverse=True
+    )
+    
+    return {
+        'first_frame_ms': statistics.median(frames),
+        'first_frame_runs_ms': frames,
+        'imports_ms': dict(slowest[:15])
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Measure time to first frame and import cost of the popups'
+    )
+    parser.add_argument('targets', nargs='*', help=', '.join(sorted(TARGETS)))
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--baseline', default=os.path.join(HERE, 'startup_baseline.json'))
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    parser.add_argument('--update', action='store_true')
+    arguments = parser.parse_args()
+    
+    # argparse сверяет с choices и пустой список nargs='*', поэтому цели
+    # проверяются здесь
+    targets = arguments.targets or sorted(TARGETS)
+    
+    for target in targets:
+        if target not in TARGETS:
+            parser.error(f'unknown target {target!r}')
+    
+    results = {target: measure(target, arguments.runs) for target in targets}
+    
+    print(json.dumps(results, indent=4))
+    
+    if arguments.update:
+        with open(arguments.baseline, 'w') as file:
+            json.dump({
+                target: {'first_frame_ms': result['first_frame_ms']}
+                for target, result in results.items()
+            }, file, indent=4)
+            file.write('\n')
+        
+        sys.exit(0)
+    
+    try:
+        with open(arguments.baseline) as file:
+            baseline = json.load(file)
+    except FileNotFoundError:
+        print(f'no baseline at {arguments.baseline}, run with --update', file=sys.stderr)
+        sys.exit(1)
+    
+    regressed = False
+    
+    # Медиана нескольких запусков сглаживает холодный кэш страниц, допуск
+    # покрывает оставшийся шум
+    for target, result in results.items():
+        if target not in baseline:
+            regressed = True
+            print(f'{target}: no baseline, run with --update', file=sys.stderr)
+            
+            continue
+        
+        limit = baseline[target]['first_frame_ms'] * (1 + arguments.tolerance)
+        
+        if result['first_frame_ms'] > limit:
+            regressed = True
+            print(
+                f'{target}: first frame {result["first_frame_ms"]:.1f} ms, limit {limit:.1f} ms',
+                file=sys.stderr
+            )
+    
+    sys.exit(1 if regressed else 0)
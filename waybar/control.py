@@ -0,0 +1,146 @@
+import os
+import sys
+import signal
+import socket
+
+
+def runtime_dir():
+    directory = os.path.join(
+        os.environ.get('XDG_RUNTIME_DIR') or f'/tmp/runtime-{os.getuid()}',
+        'soft_dots'
+    )
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    
+    return directory
+
+
+def socket_path(name):
+    return os.path.join(runtime_dir(), f'{name}.sock')
+
+
+def request(name, command, timeout=0.5):
+    # Ошибка подключения пробрасывается: команда не ушла, её можно
+    # повторить. После отправки возвращает ответ или None, если экземпляр
+    # не успел ответить
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path(name))
+        client.sendall(command.encode() + b'\n')
+        
+        try:
+            return client.recv(64).decode(errors='replace').strip()
+        except OSError:
+            return None
+
+
+def send(name, command, timeout=0.5):
+    try:
+        return request(name, command, timeout) == 'ok'
+    except OSError:
+        return False
+
+
+def quit_on_signals(application, signals=(signal.SIGTERM, signal.SIGINT)):
+    # При выходе из сессии процесс получает SIGTERM, и без обработчика
+    # aboutToQuit не срабатывает. Python выполняет обработчик только между
+    # байткодами, а цикл Qt спит в C++, поэтому его будит wakeup fd
+    from PyQt6.QtCore import QSocketNotifier
+    
+    for number in signals:
+        signal.signal(number, lambda *_: application.quit())
+    
+    reader, writer = socket.socketpair()
+    reader.setblocking(False)
+    writer.setblocking(False)
+    previous = signal.set_wakeup_fd(writer.fileno())
+    
+    # Цикл уже будит чужой wakeup fd, например из tracing.install()
+    if previous != -1:
+        signal.set_wakeup_fd(previous)
+        reader.close()
+        writer.close()
+        
+        return None
+    
+    notifier = QSocketNotifier(reader.fileno(), QSocketNotifier.Type.Read)
+    notifier.activated.connect(lambda: reader.recv(64))
+    
+    return reader, writer, notifier
+
+
+class ControlServer:
+    # Сервер живёт в цикле событий Qt: QSocketNotifier будит его только
+    # при входящем подключении. Qt импортируется лениво, чтобы клиент
+    # send() запускался без PyQt6
+    def __init__(self, name, handlers):
+        from PyQt6.QtCore import QSocketNotifier
+        
+        self.name = name
+        self.handlers = handlers
+        self.path = socket_path(name)
+        
+        if send(name, 'ping'):
+            raise RuntimeError(f'{name} is already running')
+        
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen(8)
+        self.server.setblocking(False)
+        
+        self.notifier = QSocketNotifier(
+            self.server.fileno(),
+            QSocketNotifier.Type.Read
+        )
+        self.notifier.activated.connect(self.accept)
+    
+    
+    def accept(self):
+        try:
+            connection, _ = self.server.accept()
+        except BlockingIOError:
+            return None
+        
+        with connection:
+            try:
+                connection.settimeout(0.2)
+                command = connection.recv(256).decode().strip()
+                
+                if command == 'ping':
+                    connection.sendall(b'ok\n')
+                    
+                    return None
+                
+                handler = self.handlers.get(command)
+                
+                if handler is None:
+                    connection.sendall(b'unknown\n')
+                    
+                    return None
+                
+                handler()
+                connection.sendall(b'ok\n')
+            except OSError as exception:
+                print(exception)
+    
+    
+    def close(self):
+        self.notifier.setEnabled(False)
+        self.server.close()
+        
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print(f'usage: {sys.argv[0]} <name> <command>', file=sys.stderr)
+        sys.exit(2)
+    
+    sys.exit(0 if send(sys.argv[1], sys.argv[2]) else 1)
@@ -0,0 +1,238 @@
+import os
+import sys
+import time
+import queue
+import sqlite3
+import tracing
+import threading
+
+from contextlib import closing
+
+
+def data_home():
+    return os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+
+
+class TrackHistory:
+    # Запись идёт в отдельном потоке: record() только кладёт строку в
+    # ограниченную очередь, а поток пишет пачками в одной транзакции. В
+    # режиме WAL с synchronous=NORMAL fsync случается при checkpoint, а не
+    # на каждый коммит
+    schema = """
+        CREATE TABLE IF NOT EXISTS plays (
+            id INTEGER PRIMARY KEY,
+            started REAL NOT NULL,
+            listened REAL NOT NULL,
+            player TEXT NOT NULL,
+            title TEXT NOT NULL,
+            artist TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS plays_started ON plays (started);
+        CREATE INDEX IF NOT EXISTS plays_player ON plays (player, started);
+    """
+    
+    
+    def __init__(self, path=None, batch=64, flush_after=5.0, max_queue=1024):
+        self.path = path or os.path.join(data_home(), 'soft_dots', 'history.sqlite3')
+        self.batch = batch
+        self.flush_after = flush_after
+        self.queue = queue.Queue(max_queue)
+        self.dropped = 0
+        
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        
+        # Схему создаём до запуска потока, чтобы recent() на новой базе не
+        # опередил его
+        with closing(self.connect()) as connection:
+            connection.executescript(self.schema)
+        
+        self.thread = threading.Thread(target=self.run, name='history', daemon=True)
+        self.thread.start()
+    
+    
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=5)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        
+        return connection
+    
+    
+    def record(self, started, listened, player, title, artist):
+        try:
+            self.queue.put_nowait((started, listened, player, title, artist))
+        except queue.Full:
+            self.dropped += 1
+            tracing.count('history.dropped')
+    
+    
+    def run(self):
+        with closing(self.connect()) as connection:
+            rows = []
+            
+            while True:
+                # Пачка уходит на диск, когда набралась целиком или когда
+                # очередь простояла пустой flush_after секунд
+                try:
+                    row = self.queue.get(timeout=self.flush_after if rows else None)
+                except queue.Empty:
+                    self.write(connection, rows)
+                    rows = []
+                    
+                    continue
+                
+                if row is None:
+                    break
+                
+                rows.append(row)
+                
+                if len(rows) >= self.batch:
+                    self.write(connection, rows)
+                    rows = []
+            
+            if rows:
+                self.write(connection, rows)
+    
+    
+    @tracing.traced('history.write')
+    def write(self, connection, rows):
+        try:
+            with connection:
+                connection.executemany(
+                    'INSERT INTO plays (started, listened, player, title, artist) VALUES (?, ?, ?, ?, ?)',
+                    rows
+                )
+        except sqlite3.Error as exception:
+            tracing.error('history', exception)
+    
+    
+    def recent(self, limit=20, player=None, before=None):
+        # Выборка идёт по индексу started с конца, поэтому её стоимость
+        # зависит от limit, а не от размера таблицы
+        query = 'SELECT started, listened, player, title, artist FROM plays'
+        conditions = []
+        parameters = []
+        
+        if player is not None:
+            conditions.append('player = ?')
+            parameters.append(player)
+        
+        if before is not None:
+            conditions.append('started < ?')
+            parameters.append(before)
+        
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        
+        query += ' ORDER BY started DESC LIMIT ?'
+        parameters.append(limit)
+        
+        try:
+            with closing(self.connect()) as connection:
+                return connection.execute(query, parameters).fetchall()
+        except sqlite3.Error as exception:
+            tracing.error('history', exception)
+            
+            return []
+    
+    
+    def close(self):
+        self.queue.put(None)
+        self.thread.join(timeout=5)
+
+
+class HistoryRecorder:
+    # Следит за всеми проигрывателями реестра и записывает трек, когда он
+    # сменился или проигрыватель закрылся. Учитывается только время в
+    # статусе Playing
+    min_listened = 5
+    
+    
+    def __init__(self, registry, history):
+        self.registry = registry
+        self.history = history
+        self.tracks = {}
+        
+        registry.listeners.append(self.on_changed)
+        
+        for name in list(registry.states):
+            self.on_changed(name)
+    
+    
+    def on_changed(self, name):
+        state = self.registry.states.get(name)
+        now = time.monotonic()
+        track = self.tracks.get(name)
+        
+        if state is None:
+            self.finish(name, now)
+            
+            return None
+        
+        key = (state.track_id, state.title, state.artist)
+        
+        if track is not None and track['key'] != key:
+            self.finish(name, now)
+            track = None
+        
+        if track is None:
+            if not state.title:
+                return None
+            
+            track = self.tracks[name] = {
+                'key': key,
+                'title': state.title,
+                'artist': state.artist or '',
+                'started': time.time(),
+                'listened': 0,
+                'since': None
+            }
+        
+        playing = state.status == 'Playing'
+        
+        if track['since'] is not None and not playing:
+            track['listened'] += now - track['since']
+            track['since'] = None
+        elif track['since'] is None and playing:
+            track['since'] = now
+    
+    
+    def finish(self, name, now):
+        track = self.tracks.pop(name, None)
+        
+        if track is None:
+            return None
+        
+        listened = track['listened']
+        
+        if track['since'] is not None:
+            listened += now - track['since']
+        
+        if listened >= self.min_listened:
+            self.history.record(
+                track['started'],
+                listened,
+                name.removeprefix('org.mpris.MediaPlayer2.'),
+                track['title'],
+                track['artist']
+            )
+    
+    
+    def close(self):
+        now = time.monotonic()
+        
+        for name in list(self.tracks):
+            self.finish(name, now)
+        
+        self.history.close()
+
+
+if __name__ == '__main__':
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    history = TrackHistory()
+    
+    for started, listened, player, title, artist in history.recent(limit):
+        stamp = time.strftime('%d.%m.%Y %H:%M', time.localtime(started))
+        print(f'{stamp}  {int(listened)//60}:{int(listened)%60:02d}  {artist} — {title} ({player})')
+    
+    history.close()
@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+import fcntl
+
+from control import request, runtime_dir, send
+
+
+# Единственный экземпляр держит flock на файле в runtime-каталоге. Ядро
+# снимает блокировку вместе с процессом, так что после падения не остаётся
+# ни устаревших pid-файлов, ни сканирования таблицы процессов
+commands = ('show', 'hide', 'toggle')
+
+
+def lock_path(name):
+    return os.path.join(runtime_dir(), f'{name}.lock')
+
+
+def acquire(name, wait=0):
+    # wait даёт переждать проверку running(), которая держит блокировку
+    # лишь мгновение
+    descriptor = os.open(lock_path(name), os.O_RDWR | os.O_CREAT | os.O_CLOEXEC, 0o600)
+    deadline = time.monotonic() + wait
+    
+    while True:
+        try:
+            fcntl.flock(descriptor, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            if time.monotonic() < deadline:
+                time.sleep(0.02)
+                
+                continue
+            
+            os.close(descriptor)
+            
+            return None
+        
+        return descriptor
+
+
+def running(name):
+    # Ответивший экземпляр проверяем без блокировки, чтобы не мешать
+    # запускающемуся
+    if send(name, 'ping'):
+        return True
+    
+    descriptor = acquire(name)
+    
+    if descriptor is None:
+        return True
+    
+    os.close(descriptor)
+    
+    return False
+
+
+def deliver(name, command):
+    # None - экземпляр ещё не слушает сокет и попытку можно повторить.
+    # Ушедшую команду не повторяем никогда: занятый экземпляр выполнит её
+    # позже, а повтор превратил бы один клик в несколько toggle
+    try:
+        reply = request(name, command)
+    except (ConnectionRefusedError, FileNotFoundError):
+        return None
+    except OSError:
+        return False
+    
+    return reply is None or reply == 'ok'
+
+
+def forward(name, command, timeout=2):
+    # Блокировку берут до того, как открыт сокет, поэтому при двойном
+    # клике второй запуск ждёт, пока первый начнёт принимать команды
+    deadline = time.monotonic() + timeout
+    
+    while True:
+        delivered = deliver(name, command)
+        
+        if delivered is not None:
+            return delivered
+        
+        if time.monotonic() > deadline:
+            return False
+        
+        time.sleep(0.02)
+
+
+def requested(argv, default='show'):
+    for argument in argv[1:]:
+        if argument in commands:
+            return argument
+    
+    return default
+
+
+def claim(name, command='show', timeout=2):
+    # Возвращает дескриптор блокировки, который нужно держать открытым всё
+    # время жизни процесса. Если экземпляр уже есть, команда уходит ему,
+    # а этот процесс завершается
+    deadline = time.monotonic() + timeout
+    
+    while True:
+        descriptor = acquire(name)
+        
+        if descriptor is not None:
+            return descriptor
+        
+        # Блокировку мог на мгновение взять running() из другого клика
+        delivered = deliver(name, command)
+        
+        if delivered is not None:
+            sys.exit(0 if delivered else 1)
+        
+        if time.monotonic() > deadline:
+            print(f'{name} is locked but does not answer', file=sys.stderr)
+            sys.exit(1)
+        
+        time.sleep(0.02)
+
+
+if __name__ == '__main__':
+    # instance.py <имя> <команда>: 0 - команда доставлена, 1 - экземпляра
+    # нет и его нужно запустить, 2 - экземпляр есть, но команду не принял
+    if len(sys.argv) != 3:
+        print(f'usage: {sys.argv[0]} <name> <command>', file=sys.stderr)
+        sys.exit(2)
+    
+    if not running(sys.argv[1]):
+        sys.exit(1)
+    
+    sys.exit(0 if forward(sys.argv[1], sys.argv[2]) else 2)
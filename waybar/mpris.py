@@ -0,0 +1,619 @@
+import time
+import dbus
+import tracing
+
+from dbus.mainloop.glib import DBusGMainLoop
+
+
+class PlayerState:
+    __slots__ = (
+        'title',
+        'artist',
+        'art',
+        'length',
+        'track_id',
+        'status',
+        'rate',
+        'position',
+        'stamp',
+        'can_seek',
+        'can_go_next',
+        'can_go_previous'
+    )
+    
+    
+    def __init__(self):
+        self.title = ''
+        self.artist = ''
+        self.art = ''
+        self.length = 0
+        self.track_id = None
+        self.status = 'Stopped'
+        self.rate = 1.0
+        self.position = 0
+        self.stamp = time.monotonic()
+        self.can_seek = False
+        self.can_go_next = False
+        self.can_go_previous = False
+    
+    
+    def update(self, properties):
+        if 'Metadata' in properties:
+            metadata = properties['Metadata']
+            artist = metadata.get('xesam:artist', [])
+            
+            self.title = str(metadata.get('xesam:title', ''))
+            self.artist = artist if isinstance(artist, str) else ', '.join(artist)
+            self.art = str(metadata.get('mpris:artUrl', ''))
+            self.length = metadata.get('mpris:length', 0) / 1_000_000
+            self.track_id = metadata.get('mpris:trackid')
+        
+        if 'PlaybackStatus' in properties:
+            self.status = str(properties['PlaybackStatus'])
+        
+        if 'Rate' in properties:
+            self.rate = float(properties['Rate'])
+        
+        if 'Position' in properties:
+            self.seek(properties['Position'] / 1_000_000)
+        
+        if 'CanSeek' in properties:
+            self.can_seek = bool(properties['CanSeek'])
+        
+        if 'CanGoNext' in properties:
+            self.can_go_next = bool(properties['CanGoNext'])
+        
+        if 'CanGoPrevious' in properties:
+            self.can_go_previous = bool(properties['CanGoPrevious'])
+    
+    
+    def seek(self, position):
+        self.position = position
+        self.stamp = time.monotonic()
+    
+    
+    def freeze(self):
+        self.seek(self.current_position())
+    
+    
+    def current_position(self):
+        position = self.position
+        
+        if self.status == 'Playing':
+            position += (time.monotonic() - self.stamp) * self.rate
+        
+        return min(position, self.length) if self.length else position
+    
+    
+    def metadata(self):
+        return {
+            'title': self.title,
+            'artist': self.artist,
+            'art': self.art,
+            'length': self.length
+        }
+
+
+@tracing.traced('mpris.get_all')
+def read_properties(properties, get_all=True):
+    values = {}
+    
+    if get_all:
+        try:
+            values = dict(properties.GetAll('org.mpris.MediaPlayer2.Player'))
+        except dbus.exceptions.DBusException:
+            get_all = False
+    
+    # Некоторые проигрыватели не реализуют GetAll или не отдают в нём
+    # Position, для них дочитываем свойства по одному
+    for name in ('Metadata', 'PlaybackStatus', 'Position', 'Rate'):
+        if name in values:
+            continue
+        
+        try:
+            values[name] = properties.Get('org.mpris.MediaPlayer2.Player', name)
+        except dbus.exceptions.DBusException:
+            if name == 'Metadata':
+                raise
+    
+    return values, get_all
+
+
+class PlayerRegistry:
+    # Все проигрыватели отслеживаются одновременно: список заполняется
+    # один раз, а состояние каждого поддерживается сигналами
+    # NameOwnerChanged, PropertiesChanged и Seeked. Выбор и переключение
+    # проигрывателя не требуют обращений к шине
+    def __init__(self, bus):
+        self.bus = bus
+        self.owners = {}
+        self.objects = {}
+        self.states = {}
+        self.get_all = {}
+        self.listeners = []
+        self.ranking = None
+        
+        self.bus.add_signal_receiver(
+            self.on_name_owner_changed,
+            signal_name='NameOwnerChanged',
+            dbus_interface='org.freedesktop.DBus',
+            bus_name='org.freedesktop.DBus',
+            path='/org/freedesktop/DBus'
+        )
+        self.bus.add_signal_receiver(
+            self.on_properties_changed,
+            signal_name='PropertiesChanged',
+            dbus_interface='org.freedesktop.DBus.Properties',
+            path='/org/mpris/MediaPlayer2',
+            sender_keyword='sender'
+        )
+        self.bus.add_signal_receiver(
+            self.on_seeked,
+            signal_name='Seeked',
+            dbus_interface='org.mpris.MediaPlayer2.Player',
+            path='/org/mpris/MediaPlayer2',
+            sender_keyword='sender'
+        )
+        
+        try:
+            names = self.bus.list_names()
+        except dbus.exceptions.DBusException:
+            names = []
+        
+        for name in names:
+            if not name.startswith('org.mpris.MediaPlayer2.'):
+                continue
+            
+            try:
+                self.add(name, str(self.bus.get_name_owner(name)))
+            except dbus.exceptions.DBusException:
+                pass
+    
+    
+    @tracing.traced('mpris.registry_add')
+    def add(self, name, owner):
+        self.owners[name] = owner
+        self.objects.pop(name, None)
+        self.get_all[name] = True
+        self.states[name] = PlayerState()
+        self.ranking = None
+        
+        try:
+            self.refresh(name)
+        except dbus.exceptions.DBusException:
+            pass
+    
+    
+    def remove(self, name):
+        self.owners.pop(name, None)
+        self.objects.pop(name, None)
+        self.states.pop(name, None)
+        self.get_all.pop(name, None)
+        self.ranking = None
+    
+    
+    def object(self, name):
+        object = self.objects.get(name)
+        
+        if object is None:
+            object = self.bus.get_object(name, '/org/mpris/MediaPlayer2')
+            self.objects[name] = object
+        
+        return object
+    
+    
+    def properties(self, name):
+        return dbus.Interface(self.object(name), 'org.freedesktop.DBus.Properties')
+    
+    
+    def refresh(self, name):
+        values, self.get_all[name] = read_properties(
+            self.properties(name),
+            self.get_all.get(name, True)
+        )
+        self.states[name].update(values)
+    
+    
+    @tracing.traced('mpris.position')
+    def sync_position(self, name):
+        state = self.states[name]
+        
+        try:
+            position = self.properties(name).Get(
+                'org.mpris.MediaPlayer2.Player',
+                'Position'
+            )
+            state.seek(position / 1_000_000)
+        except dbus.exceptions.DBusException:
+            state.freeze()
+    
+    
+    def names(self, owner):
+        return [name for name, candidate in self.owners.items() if candidate == owner]
+    
+    
+    def players(self):
+        if self.ranking is None:
+            self.ranking = sorted(
+                self.owners,
+                key=lambda name: (
+                    {'Playing': 0, 'Paused': 1}.get(self.states[name].status, 2),
+                    name
+                )
+            )
+        
+        return list(self.ranking)
+    
+    
+    def playing(self):
+        return any(state.status == 'Playing' for state in self.states.values())
+    
+    
+    def notify(self, name):
+        for listener in self.listeners:
+            listener(name)
+    
+    
+    def on_name_owner_changed(self, name, old_owner, new_owner):
+        if not name.startswith('org.mpris.MediaPlayer2.'):
+            return None
+        
+        if old_owner:
+            self.remove(name)
+        
+        if new_owner:
+            self.add(name, str(new_owner))
+        
+        self.notify(name)
+    
+    
+    def on_properties_changed(self, interface, changed, invalidated, sender=None):
+        tracing.count('mpris.properties_changed')
+        
+        if interface != 'org.mpris.MediaPlayer2.Player':
+            return None
+        
+        for name in self.names(sender):
+            state = self.states[name]
+            
+            # Фиксируем экстраполированную позицию до смены статуса или скорости
+            state.freeze()
+            
+            try:
+                if 'Metadata' in invalidated or 'PlaybackStatus' in invalidated:
+                    self.refresh(name)
+                
+                state.update(changed)
+                
+                # Position не рассылается в PropertiesChanged, поэтому при
+                # смене трека или статуса запрашиваем её один раз
+                if 'Metadata' in changed or 'PlaybackStatus' in changed:
+                    self.sync_position(name)
+            except dbus.exceptions.DBusException as exception:
+                tracing.error('mpris', exception)
+            
+            if 'PlaybackStatus' in changed or 'PlaybackStatus' in invalidated:
+                self.ranking = None
+            
+            self.notify(name)
+    
+    
+    def on_seeked(self, position, sender=None):
+        tracing.count('mpris.seeked')
+        
+        for name in self.names(sender):
+            self.states[name].seek(position / 1_000_000)
+            self.notify(name)
+
+
+class MPRIS:
+    def __init__(self, watch=False):
+        DBusGMainLoop(set_as_default=True)
+        
+        self.bus = dbus.SessionBus()
+        self.current_player = None
+        self.properties = None
+        self.player = None
+        self.track_list = None
+        self.connected = False
+        
+        # HasTrackList проигрывателя запрашивается один раз
+        self.has_track_list = {}
+        
+        # В режиме watch состояния всех проигрывателей берутся из сигналов
+        # через PlayerRegistry, а позиция экстраполируется локально
+        self.watch = watch
+        self.state = None
+        self.get_all = True
+        self.listeners = []
+        self.registry = None
+        
+        if watch:
+            self.registry = PlayerRegistry(self.bus)
+            self.registry.listeners.append(self.on_players_changed)
+    
+    
+    def get_players(self):
+        if self.registry:
+            return list(self.registry.owners)
+        
+        try:
+            return [
+                player for player in self.bus.list_names()
+                if player.startswith('org.mpris.MediaPlayer2.')
+            ]
+        except:
+            return []
+    
+    
+    def disconnect(self):
+        self.connected = False
+        self.current_player = None
+        self.properties = None
+        self.player = None
+        self.track_list = None
+        self.state = None
+    
+    
+    def _prioritised_players(self):
+        if self.registry:
+            return self.registry.players()
+        
+        players = self.get_players()
+        
+        if not players:
+            return []
+        
+        
+        def state_key(name):
+            try:
+                object = self.bus.get_object(name, '/org/mpris/MediaPlayer2')
+                properties = dbus.Interface(object, 'org.freedesktop.DBus.Properties')
+                string = str(
+                    properties.Get(
+                        'org.mpris.MediaPlayer2.Player',
+                        'PlaybackStatus'
+                    )
+                )
+                
+                return {'Playing': 0, 'Paused': 1}.get(string, 2)
+            except:
+                return 3
+        
+        players.sort(key=lambda n: (state_key(n), n))
+        
+        return players
+    
+    
+    def connect_any(self):
+        self.disconnect()
+        
+        for candidate in self._prioritised_players():
+            if self.connect(candidate):
+                return True
+        
+        return False
+    
+    
+    @tracing.traced('mpris.connect')
+    def connect(self, name):
+        self.state = None
+        
+        try:
+            if self.registry:
+                object = self.registry.object(name)
+                self.state = self.registry.states[name]
+            else:
+                object = self.bus.get_object(name, '/org/mpris/MediaPlayer2')
+            
+            self.properties = dbus.Interface(
+                object,
+                'org.freedesktop.DBus.Properties'
+            )
+            self.player = dbus.Interface(object, 'org.mpris.MediaPlayer2.Player')
+            self.track_list = dbus.Interface(object, 'org.mpris.MediaPlayer2.TrackList')
+            self.current_player = name
+            self.connected = True
+            self.get_all = True
+            
+            return True
+        except:
+            self.state = None
+            self.connected = False
+            
+            return False
+    
+    
+    def cycle(self, step=1):
+        # Порядок перебора не зависит от статусов, чтобы прокрутка
+        # не перескакивала при смене Playing/Paused
+        if not self.registry:
+            return False
+        
+        players = sorted(self.registry.owners)
+        
+        if not players:
+            return False
+        
+        if self.current_player in players:
+            index = (players.index(self.current_player) + step) % len(players)
+        else:
+            index = 0
+        
+        return self.connect(players[index])
+    
+    
+    def notify(self):
+        for listener in self.listeners:
+            listener()
+    
+    
+    def on_players_changed(self, name):
+        # Если текущий проигрыватель завершился, сразу переходим на
+        # следующий по приоритету: его состояние уже лежит в реестре
+        if name == self.current_player and name not in self.registry.owners:
+            self.connect_any()
+        
+        elif name == self.current_player and self.registry.states[name] is not self.state:
+            self.connect(name)
+        
+        elif not self.connected:
+            self.connect_any()
+        
+        self.notify()
+    
+    
+    def snapshot(self):
+        if not self.properties or not self.connected:
+            return None
+        
+        if self.state is not None:
+            return self.state
+        
+        try:
+            values, self.get_all = read_properties(self.properties, self.get_all)
+            state = PlayerState()
+            state.update(values)
+            
+            return state
+        except dbus.exceptions.DBusException as e:
+            if 'NoActivePlayer' in str(e) or 'No player' in str(e):
+                self.disconnect()
+            
+            return None
+        except Exception:
+            return None
+    
+    
+    def metadata(self):
+        state = self.snapshot()
+        
+        return state.metadata() if state else {}
+    
+    
+    def position(self):
+        state = self.snapshot()
+        
+        return state.current_position() if state else 0
+    
+    
+    def status(self):
+        state = self.snapshot()
+        
+        return state.status if state else 'Stopped'
+    
+    
+    @tracing.traced('mpris.play_pause')
+    def play_pause(self):
+        if self.player and self.connected:
+            try:
+                self.player.PlayPause()
+            except:
+                self.connected = False
+    
+    
+    @tracing.traced('mpris.next')
+    def next(self):
+        if self.player and self.connected:
+            try:
+                self.player.Next()
+            except:
+                self.connected = False
+    
+    
+    @tracing.traced('mpris.prev')
+    def prev(self):
+        if self.player and self.connected:
+            try:
+                self.player.Previous()
+            except:
+                self.connected = False
+    
+    
+    def upcoming(self, callback, count=3):
+        # Соседние треки из org.mpris.MediaPlayer2.TrackList. Все вызовы
+        # асинхронные, callback получает адреса обложек, когда ответы придут
+        state = self.snapshot()
+        name = self.current_player
+        
+        if not state or not state.track_id or self.has_track_list.get(name) is False:
+            return None
+        
+        track_id = state.track_id
+        properties = self.properties
+        track_list = self.track_list
+        
+        
+        def on_error(exception):
+            tracing.count('mpris.track_list.errors')
+        
+        
+        def on_has_track_list(value):
+            self.has_track_list[name] = bool(value)
+            
+            if value:
+                properties.Get(
+                    'org.mpris.MediaPlayer2.TrackList',
+                    'Tracks',
+                    reply_handler=on_tracks,
+                    error_handler=on_error
+                )
+        
+        
+        def on_tracks(tracks):
+            tracks = [str(track) for track in tracks]
+            
+            if track_id not in tracks:
+                return None
+            
+            # Следующие count треков и предыдущий, чтобы обе кнопки
+            # переключали без ожидания обложки
+            index = tracks.index(track_id)
+            neighbours = tracks[index + 1:index + 1 + count] + tracks[max(0, index - 1):index]
+            
+            if neighbours:
+                tracing.count('mpris.track_list')
+                track_list.GetTracksMetadata(
+                    [dbus.ObjectPath(track) for track in neighbours],
+                    reply_handler=on_metadata,
+                    error_handler=on_error
+                )
+        
+        
+        def on_metadata(items):
+            callback([str(item['mpris:artUrl']) for item in items if item.get('mpris:artUrl')])
+        
+        
+        if name in self.has_track_list:
+            on_has_track_list(True)
+        else:
+            properties.Get(
+                'org.mpris.MediaPlayer2',
+                'HasTrackList',
+                reply_handler=on_has_track_list,
+                error_handler=on_error
+            )
+    
+    
+    @tracing.traced('mpris.set_position')
+    def set_position(self, position):
+        state = self.snapshot()
+        
+        # SetPosition без trackid проигрыватель обязан игнорировать
+        if not state or not state.track_id or not state.can_seek:
+            return False
+        
+        try:
+            self.player.SetPosition(
+                dbus.ObjectPath(state.track_id),
+                dbus.Int64(int(max(0, position) * 1_000_000))
+            )
+        except:
+            self.connected = False
+            
+            return False
+        
+        # Сразу показываем новую позицию, а сигнал Seeked потом уточнит её
+        state.seek(position)
+        
+        return True
@@ -0,0 +1,44 @@
+import sys
+import tracing
+
+from mpris import MPRIS
+from PyQt6.QtCore import QCoreApplication
+
+
+class StatusEmitter:
+    icons = {True: '󰎇', False: '󰎊'}
+    
+    
+    def __init__(self, mpris, publish=None):
+        self.registry = mpris.registry
+        self.publish = publish or self.write
+        self.last = None
+        
+        self.registry.listeners.append(self.emit)
+        self.emit()
+    
+    
+    def emit(self, name=None):
+        playing = self.registry.playing()
+        
+        # waybar получает строку только при смене общего состояния
+        if playing == self.last:
+            return None
+        
+        self.last = playing
+        self.publish(self.icons[playing])
+    
+    
+    @staticmethod
+    def write(icon):
+        try:
+            print(icon, flush=True)
+        except BrokenPipeError:
+            QCoreApplication.quit()
+
+
+if __name__ == '__main__':
+    application = QCoreApplication(sys.argv)
+    tracing.install()
+    emitter = StatusEmitter(MPRIS(watch=True))
+    sys.exit(application.exec())
@@ -0,0 +1,63 @@
+import colorsys
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImage
+
+
+def hls(rgb):
+    return colorsys.rgb_to_hls(*(channel / 255 for channel in rgb))
+
+
+def rgb(hue, lightness, saturation):
+    return tuple(round(channel * 255) for channel in colorsys.hls_to_rgb(hue, lightness, saturation))
+
+
+def css(color):
+    return '#{:02x}{:02x}{:02x}'.format(*color)
+
+
+def extract(image: QImage, colors=6, side=32):
+    from PIL import Image
+    
+    # Палитра считается по миниатюре 32×32 уже декодированной обложки:
+    # median cut в Pillow проходит её целиком на C за доли миллисекунды
+    thumbnail = image.scaled(
+        side, side,
+        Qt.AspectRatioMode.IgnoreAspectRatio,
+        Qt.TransformationMode.FastTransformation
+    ).convertToFormat(QImage.Format.Format_RGBX8888)
+    pixels = Image.frombuffer(
+        'RGBX',
+        (thumbnail.width(), thumbnail.height()),
+        thumbnail.constBits().asstring(thumbnail.sizeInBytes()),
+        'raw', 'RGBX', thumbnail.bytesPerLine(), 1
+    ).convert('RGB')
+    
+    quantized = pixels.quantize(colors, method=Image.Quantize.MEDIANCUT)
+    values = quantized.getpalette()
+    counts = quantized.getcolors() or []
+    total = sum(count for count, _ in counts) or 1
+    swatches = [
+        (count / total, hls(values[index * 3:index * 3 + 3]))
+        for count, index in sorted(counts, reverse=True)
+    ]
+    
+    if not swatches:
+        return None
+    
+    # Фон берётся от самого частого цвета, акцент от самого насыщенного
+    # из заметных, с поправкой яркости ради контраста с текстом
+    _, (hue, lightness, saturation) = swatches[0]
+    red, green, blue = rgb(hue, min(lightness, 0.14), min(saturation, 0.45))
+    
+    _, (hue, lightness, saturation) = max(
+        swatches,
+        key=lambda swatch: swatch[1][2] * (0.3 + swatch[0]) * (1 - abs(swatch[1][1] - 0.55))
+    )
+    
+    return {
+        'accent': css(rgb(hue, min(max(lightness, 0.5), 0.68), saturation)),
+        'muted': css(rgb(hue, 0.72, saturation * 0.4)),
+        'background': f'rgba({red}, {green}, {blue}, 0.85)',
+        'text': css(rgb(hue, 0.96, min(saturation, 0.6)))
+    }
@@ -0,0 +1,89 @@
+import sys
+import tracing
+import instance
+import importlib
+
+from control import ControlServer
+from PyQt6.QtWidgets import QApplication
+
+
+class PopupHost:
+    # Один процесс, один QApplication и одно подключение к сессионной
+    # шине на все всплывающие окна. Панель создаётся при первом обращении
+    # и дальше только показывается и прячется
+    panels = {
+        'audio_player': ('audio_player', 'AudioPlayer'),
+        'power_menu': ('power_menu', 'PowerMenu')
+    }
+    commands = {
+        'show': 'present',
+        'hide': 'dismiss',
+        'toggle': 'toggle'
+    }
+    
+    
+    def __init__(self, application):
+        self.application = application
+        self.instances = {}
+        
+        handlers = {'quit': application.quit}
+        
+        for panel in self.panels:
+            for command in self.commands:
+                handlers[f'{panel} {command}'] = (
+                    lambda panel=panel, command=command: self.dispatch(panel, command)
+                )
+        
+        self.server = ControlServer('popup_host', handlers)
+        application.aboutToQuit.connect(self.server.close)
+    
+    
+    def panel(self, name):
+        widget = self.instances.get(name)
+        
+        if widget is None:
+            module, factory = self.panels[name]
+            
+            with tracing.span(f'host.create.{name}'):
+                widget = getattr(importlib.import_module(module), factory)()
+            
+            widget.resident = True
+            self.instances[name] = widget
+        
+        return widget
+    
+    
+    def dispatch(self, name, command):
+        if name not in self.instances:
+            # Ещё не созданную панель прятать незачем, а toggle её открывает
+            if command == 'hide':
+                return None
+            
+            command = 'show'
+        
+        getattr(self.panel(name), self.commands[command])()
+
+
+if __name__ == '__main__':
+    panel = sys.argv[1] if len(sys.argv) > 1 else None
+    command = instance.requested(sys.argv[1:])
+    
+    # Второй хост не запускается: команда уходит уже работающему
+    lock = instance.claim('popup_host', f'{panel} {command}' if panel else 'ping')
+    
+    application = QApplication(sys.argv)
+    application.setQuitOnLastWindowClosed(False)
+    tracing.install()
+    
+    try:
+        host = PopupHost(application)
+    except RuntimeError as exception:
+        print(exception, file=sys.stderr)
+        sys.exit(1)
+    
+    # popup_host.py <панель> [команда]: первый клик запускает хост и
+    # сразу открывает нужную панель
+    if panel:
+        host.dispatch(panel, command)
+    
+    sys.exit(application.exec())
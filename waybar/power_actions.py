@@ -0,0 +1,142 @@
+import os
+import socket
+
+
+class ActionError(Exception):
+    pass
+
+
+class Login1Backend:
+    # org.freedesktop.login1.Manager на системной шине. Шину можно
+    # подменить, чтобы проверять действия на поддельном login1
+    def __init__(self, bus=None):
+        self.bus = bus
+        self.manager = None
+    
+    
+    def interface(self):
+        import dbus
+        
+        if self.manager is None:
+            bus = self.bus
+            
+            if bus is None:
+                bus = dbus.SessionBus() if os.environ.get('SOFT_DOTS_LOGIN1_BUS') == 'session' else dbus.SystemBus()
+            
+            self.manager = dbus.Interface(
+                bus.get_object('org.freedesktop.login1', '/org/freedesktop/login1'),
+                'org.freedesktop.login1.Manager'
+            )
+        
+        return self.manager
+    
+    
+    def call(self, method, *arguments):
+        import dbus
+        
+        try:
+            return getattr(self.interface(), method)(*arguments, timeout=5)
+        except dbus.exceptions.DBusException as exception:
+            self.manager = None
+            raise ActionError(exception.get_dbus_message() or str(exception)) from exception
+    
+    
+    def power_off(self):
+        self.call('PowerOff', True)
+    
+    
+    def reboot(self):
+        self.call('Reboot', True)
+    
+    
+    def lock(self):
+        # login1 только рассылает сигнал Lock сессии, экран блокирует тот,
+        # кто его слушает (hypridle)
+        session = os.environ.get('XDG_SESSION_ID')
+        
+        if session:
+            self.call('LockSession', session)
+        else:
+            self.call('LockSessions')
+
+
+class HyprlandBackend:
+    # Команды уходят в управляющий сокет Hyprland напрямую, без hyprctl
+    def __init__(self, path=None):
+        self.path = path
+    
+    
+    def socket_path(self):
+        if self.path:
+            return self.path
+        
+        signature = os.environ.get('HYPRLAND_INSTANCE_SIGNATURE')
+        
+        if not signature:
+            raise ActionError('HYPRLAND_INSTANCE_SIGNATURE is not set')
+        
+        runtime = os.environ.get('XDG_RUNTIME_DIR') or f'/run/user/{os.getuid()}'
+        
+        for directory in (os.path.join(runtime, 'hypr'), '/tmp/hypr'):
+            path = os.path.join(directory, signature, '.socket.sock')
+            
+            if os.path.exists(path):
+                return path
+        
+        raise ActionError('Hyprland socket not found')
+    
+    
+    def request(self, command, timeout=2):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.settimeout(timeout)
+                client.connect(self.socket_path())
+                client.sendall(command.encode())
+                reply = client.recv(4096).decode(errors='replace').strip()
+        except OSError as exception:
+            raise ActionError(str(exception)) from exception
+        
+        if reply != 'ok':
+            raise ActionError(reply or f'no reply to {command!r}')
+    
+    
+    def dispatch(self, *arguments):
+        self.request(' '.join(['dispatch', *arguments]))
+    
+    
+    def exit(self):
+        self.dispatch('exit')
+    
+    
+    def lock(self):
+        # hyprlock запускает сам Hyprland, меню не порождает процессов
+        self.dispatch('exec', 'hyprlock')
+
+
+class PowerActions:
+    # Действие -> (бэкенд, метод). Таблицу и бэкенды можно заменить
+    actions = {
+        'poweroff': ('login1', 'power_off'),
+        'reboot': ('login1', 'reboot'),
+        'lock': ('hyprland', 'lock'),
+        'exit': ('hyprland', 'exit')
+    }
+    
+    
+    def __init__(self, **backends):
+        self.backends = {
+            'login1': backends.get('login1') or Login1Backend(),
+            'hyprland': backends.get('hyprland') or HyprlandBackend()
+        }
+    
+    
+    def run(self, action):
+        # Возвращает None при успехе или текст ошибки
+        backend, method = self.actions[action]
+        
+        try:
+            getattr(self.backends[backend], method)()
+        except ActionError as exception:
+            return str(exception)
+        
+        return None
@@ -1,11 +1,16 @@
 import sys
-import subprocess
+import time
+import tracing
+import instance
 
+from control import ControlServer
 from PyQt6.QtCore import (
     Qt,
     QEvent,
     QPoint,
     QPropertyAnimation,
+    QParallelAnimationGroup,
+    QSequentialAnimationGroup,
     QEasingCurve,
     QTimer
 )
@@ -17,6 +22,23 @@ from PyQt6.QtWidgets import (
 
 
 class PowerMenu(QWidget):
+    # Цель для резидентного режима: от команды toggle до первого кадра
+    # не дольше одного кадра при 60 Гц
+    open_budget_ms = 16
+    stylesheet = """
+        QPushButton {
+            background-color: #9375f5;
+            color: #efebff;
+            border-radius: 20px;
+            font-size: 14px;
+        }
+        
+        QPushButton[failed="true"] {
+            background-color: #f57575;
+        }
+    """
+    
+    
     def __init__(self):
         super().__init__()
         
@@ -27,70 +49,139 @@ class PowerMenu(QWidget):
         )
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         self.commands = [
-            ('S', ['systemctl', 'poweroff']),
-            ('󰌾', ['hyprlock']),
-            ('', ['systemctl', 'reboot']),
-            ('', ['hyprctl', 'dispatch', 'exit']),
+            ('S', 'poweroff'),
+            ('󰌾', 'lock'),
+            ('', 'reboot'),
+            ('', 'exit'),
         ]
         self.buttons = []
-        self.animations = []
+        self.resident = False
+        self.painted = False
+        self.opened_at = None
         
-        for text, command in self.commands:
+        self.actions = None
+        
+        for text, action in self.commands:
             button = QPushButton(text, self)
             button.setFixedSize(40, 40)
             button.setCursor(Qt.CursorShape.PointingHandCursor)
             button.move(8, 8)
             button.clicked.connect(
-                lambda _, command=command: self.execute(command)
+                lambda _, button=button, action=action: self.execute(button, action)
             )
             
             self.buttons.append(button)
         
         self.resize(56, 200)
-        self.show()
-        self.animate_open()
+        self.setStyleSheet(self.stylesheet)
+        self.build_animations()
     
     
-    def animate_open(self):
+    def build_animations(self):
+        # Анимации создаются один раз и только перезапускаются: задержка
+        # каскада задаётся паузой внутри последовательной группы, а не
+        # отдельными таймерами
         count = len(self.buttons)
         
-        self.animations.clear()
+        self.opening = QParallelAnimationGroup(self)
+        self.closing = QParallelAnimationGroup(self)
         
         for i, button in enumerate(self.buttons):
-            animation = QPropertyAnimation(button, b'pos', self)
+            opening = QSequentialAnimationGroup(self.opening)
+            opening.addPause((count - 1 - i) * 90)
+            animation = QPropertyAnimation(button, b'pos', opening)
             animation.setStartValue(QPoint(8, 8))
             animation.setEndValue(QPoint(8, 8 + i * 48))
             animation.setDuration(180)
             animation.setEasingCurve(QEasingCurve.Type.OutCubic)
+            opening.addAnimation(animation)
+            self.opening.addAnimation(opening)
             
-            self.animations.append(animation)
-            
-            QTimer.singleShot(
-                (count - 1 - i) * 90,
-                animation.start
-            )
-    
-    
-    def animate_close(self):
-        count = len(self.buttons)
-        
-        self.animations.clear()
-        
-        for i, button in enumerate(self.buttons):
-            animation = QPropertyAnimation(button, b'pos', self)
-            animation.setStartValue(button.pos())
+            # Без начального значения анимация стартует с текущей позиции,
+            # так что закрытие посреди открытия не дёргает кнопки
+            closing = QSequentialAnimationGroup(self.closing)
+            closing.addPause(i * 90)
+            animation = QPropertyAnimation(button, b'pos', closing)
             animation.setEndValue(QPoint(8, 8))
             animation.setDuration(180)
             animation.setEasingCurve(QEasingCurve.Type.InCubic)
-            self.animations.append(animation)
+            closing.addAnimation(animation)
+            self.closing.addAnimation(closing)
+        
+        self.closing.finished.connect(self.on_closed)
+    
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        
+        if self.opened_at is not None:
+            now = time.perf_counter()
+            tracing.record('menu.open', self.opened_at, now)
             
-            QTimer.singleShot(
-                i * 90,
-                animation.start
-            )
+            if (now - self.opened_at) * 1000 > self.open_budget_ms:
+                tracing.count('menu.open_over_budget')
+            
+            self.opened_at = None
+        
+        # Кнопки разъезжаются только после первого кадра, чтобы окно
+        # появлялось без ожидания анимации
+        if not self.painted:
+            self.painted = True
+            tracing.first_frame()
+            QTimer.singleShot(0, self.animate_open)
+    
+    
+    def present(self):
+        self.opened_at = time.perf_counter()
+        self.closing.stop()
+        
+        for button in self.buttons:
+            button.move(8, 8)
             
-            if i == count - 1:
-                animation.finished.connect(QApplication.quit)
+            if button.property('failed'):
+                button.setProperty('failed', False)
+                button.setToolTip('')
+                button.style().polish(button)
+        
+        self.show()
+        self.raise_()
+        self.activateWindow()
+        
+        if self.painted:
+            self.animate_open()
+    
+    
+    def toggle(self):
+        # Клик по модулю waybar сначала снимает с меню фокус и запускает
+        # закрытие, поэтому toggle во время закрытия ничего не делает
+        if self.isVisible():
+            self.animate_close()
+        else:
+            self.present()
+    
+    
+    def dismiss(self):
+        self.animate_close()
+    
+    
+    def animate_open(self):
+        self.opening.stop()
+        self.opening.start()
+    
+    
+    def animate_close(self):
+        if not self.isVisible() or self.closing.state() == QParallelAnimationGroup.State.Running:
+            return None
+        
+        self.opening.stop()
+        self.closing.start()
+    
+    
+    def on_closed(self):
+        if self.resident:
+            self.hide()
+        else:
+            QApplication.quit()
     
     
     def changeEvent(self, event):
@@ -106,22 +197,45 @@ class PowerMenu(QWidget):
             self.animate_close()
     
     
-    def execute(self, command):
-        subprocess.Popen(command)
-        QApplication.quit()
+    def execute(self, button, action):
+        from power_actions import PowerActions
+        
+        if self.actions is None:
+            self.actions = PowerActions()
+        
+        error = self.actions.run(action)
+        
+        # При ошибке меню остаётся открытым, а кнопка показывает причину
+        if error:
+            tracing.error('power', error)
+            button.setProperty('failed', True)
+            button.setToolTip(error)
+            button.style().polish(button)
+            
+            return None
+        
+        self.on_closed()
 
 
 if __name__ == '__main__':
+    lock = instance.claim('power_menu', instance.requested(sys.argv))
+    
     application = QApplication(sys.argv)
+    tracing.install()
     widget = PowerMenu()
-    widget.setStyleSheet(
-        """
-        QPushButton {
-            background-color: #9375f5;
-            color: #efebff;
-            border-radius: 20px;
-            font-size: 14px;
-        }
-        """
-    )
+    server = ControlServer('power_menu', {
+        'show': widget.present,
+        'hide': widget.dismiss,
+        'toggle': widget.toggle,
+        'quit': application.quit
+    })
+    application.aboutToQuit.connect(server.close)
+    
+    # Резидентное меню прячется между вызовами и открывается командой
+    # toggle через управляющий сокет
+    if '--resident' in sys.argv:
+        widget.resident = True
+        application.setQuitOnLastWindowClosed(False)
+    
+    widget.present()
     sys.exit(application.exec())
@@ -0,0 +1,15 @@
+#!/bin/bash
+
+
+# Все всплывающие окна живут в одном процессе popup_host.py: клик только
+# отправляет команду в его сокет, а Qt запускается лишь при первом клике
+PANEL="$1"
+COMMAND="${2:-toggle}"
+
+[[ -z "$PANEL" ]] && exit 1
+
+python3 -S "$HOME/.config/waybar/instance.py" popup_host "$PANEL $COMMAND" 2> /dev/null
+[[ $? -ne 1 ]] && exit 0
+
+. "$HOME/.config/waybar/venv/bin/activate"
+exec python "$HOME/.config/waybar/popup_host.py" "$PANEL" "$COMMAND"
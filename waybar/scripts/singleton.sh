@@ -2,13 +2,15 @@
 
 
 FILE="$HOME/.config/waybar/$1"
+NAME="$(basename "$1" .py)"
 
 [[ -z "$1" ]] && exit 1
 [[ ! -f "$FILE" ]] && exit 1
 
-if pgrep -f "python .*${FILE}" > /dev/null; then
-    exit 0
-fi
+# Живой экземпляр держит блокировку в runtime-каталоге и получает команду
+# через сокет; 1 означает, что экземпляра нет и его нужно запустить
+python3 -S "$HOME/.config/waybar/instance.py" "$NAME" toggle 2> /dev/null
+[[ $? -ne 1 ]] && exit 0
 
 . "$HOME/.config/waybar/venv/bin/activate"
-exec python "$FILE"
+exec python "$FILE" "${@:2}"
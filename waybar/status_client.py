@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import socket
+import subprocess
+
+from control import socket_path
+from instance import running
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def start_daemon():
+    python = os.path.join(HERE, 'venv', 'bin', 'python')
+    
+    # Демон отвязывается от сессии клиента, чтобы пережить перезапуск waybar
+    subprocess.Popen(
+        [python if os.path.exists(python) else sys.executable, os.path.join(HERE, 'status_daemon.py')],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+
+
+def stream(name, output=sys.stdout):
+    delay = 0.1
+    started = 0
+    
+    # Клиент только переписывает строки из сокета демона в stdout waybar;
+    # если демона нет, он запускается, а при обрыве клиент переподключается
+    while True:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.connect(socket_path(f'status-{name}'))
+                delay = 0.1
+                
+                for line in client.makefile('r', encoding='utf-8'):
+                    output.write(line)
+                    output.flush()
+        except (ConnectionRefusedError, FileNotFoundError):
+            # Запущенному демону нужно время, чтобы открыть сокеты
+            if time.monotonic() - started > 5 and not running('status'):
+                started = time.monotonic()
+                start_daemon()
+        except BrokenPipeError:
+            return None
+        except OSError as exception:
+            print(exception, file=sys.stderr)
+        
+        time.sleep(delay)
+        delay = min(delay * 2, 5)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print(f'usage: {sys.argv[0]} <module>', file=sys.stderr)
+        sys.exit(2)
+    
+    try:
+        stream(sys.argv[1])
+    except KeyboardInterrupt:
+        pass
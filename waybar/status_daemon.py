@@ -0,0 +1,204 @@
+import os
+import re
+import sys
+import json
+import socket
+import tracing
+import instance
+import subprocess
+
+from control import ControlServer, quit_on_signals, socket_path
+from dbus.mainloop.glib import DBusGMainLoop
+from history import HistoryRecorder, TrackHistory
+from mpris import MPRIS
+from mpris_status import StatusEmitter
+from PyQt6.QtCore import QCoreApplication, QProcess, QSocketNotifier, QTimer
+
+
+class StatusServer:
+    # Последняя строка модуля раздаётся всем подключённым клиентам, а новый
+    # клиент получает её сразу после подключения
+    def __init__(self, name):
+        self.path = socket_path(f'status-{name}')
+        self.clients = []
+        self.last = None
+        
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        self.server.listen(8)
+        self.server.setblocking(False)
+        
+        self.notifier = QSocketNotifier(self.server.fileno(), QSocketNotifier.Type.Read)
+        self.notifier.activated.connect(self.accept)
+    
+    
+    def accept(self):
+        try:
+            connection, _ = self.server.accept()
+        except BlockingIOError:
+            return None
+        
+        connection.setblocking(False)
+        self.clients.append(connection)
+        
+        if self.last is not None:
+            self.send(connection, self.last)
+    
+    
+    def publish(self, value):
+        line = (json.dumps(value, ensure_ascii=False) + '\n').encode()
+        
+        if line == self.last:
+            return None
+        
+        self.last = line
+        tracing.count('status.publish')
+        
+        for client in list(self.clients):
+            self.send(client, line)
+    
+    
+    def send(self, client, line):
+        # Клиент, который не успевает читать, отключается, а не задерживает
+        # остальных
+        try:
+            client.sendall(line)
+        except OSError:
+            self.clients.remove(client)
+            client.close()
+    
+    
+    def close(self):
+        self.notifier.setEnabled(False)
+        self.server.close()
+        
+        for client in self.clients:
+            client.close()
+        
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class VolumeSource:
+    icons = ('', ' ', ' ', '')
+    
+    
+    def __init__(self, publish):
+        self.publish = publish
+        
+        # Пачка событий от прокрутки колеса сводится к одному опросу
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(50)
+        self.timer.timeout.connect(self.refresh)
+        
+        self.process = QProcess()
+        self.process.readyReadStandardOutput.connect(self.on_output)
+        self.process.finished.connect(lambda *_: QTimer.singleShot(1000, self.start))
+        self.start()
+        self.refresh()
+    
+    
+    def start(self):
+        self.process.start('pactl', ['subscribe'])
+    
+    
+    def on_output(self):
+        output = bytes(self.process.readAllStandardOutput()).decode(errors='replace')
+        
+        # Смена громкости приходит как событие sink, смена устройства по
+        # умолчанию как событие server
+        if ' on sink ' in output or ' on server' in output:
+            self.timer.start()
+    
+    
+    @staticmethod
+    def pactl(*arguments):
+        try:
+            result = subprocess.run(
+                ['pactl', *arguments],
+                capture_output=True,
+                text=True,
+                timeout=1
+            )
+        except (OSError, subprocess.SubprocessError):
+            return None
+        
+        return result.stdout if result.returncode == 0 else None
+    
+    
+    def refresh(self):
+        volume = self.pactl('get-sink-volume', '@DEFAULT_SINK@')
+        mute = self.pactl('get-sink-mute', '@DEFAULT_SINK@')
+        match = re.search(r'(\d+)%', volume or '')
+        volume = int(match.group(1)) if match else 0
+        muted = bool(mute and 'yes' in mute)
+        
+        if muted:
+            icon = self.icons[0]
+        elif volume < 1:
+            icon = self.icons[1]
+        elif volume < 50:
+            icon = self.icons[2]
+        else:
+            icon = self.icons[3]
+        
+        self.publish({
+            'text': f'<span color="#ffc6ff">{icon}</span>',
+            'tooltip': f'󰺢  {volume}%'
+        })
+
+
+if __name__ == '__main__':
+    # Клиенты нескольких модулей могут запустить демон одновременно,
+    # работать остаётся тот, кто взял блокировку
+    lock = instance.acquire('status', wait=0.5)
+    
+    if lock is None:
+        sys.exit(0)
+    
+    DBusGMainLoop(set_as_default=True)
+    
+    application = QCoreApplication(sys.argv)
+    tracing.install()
+    
+    # Демон отвязан от сессии клиента и в конце сессии получает SIGTERM:
+    # через aboutToQuit история успевает дописать текущий трек
+    wakeup = quit_on_signals(application)
+    
+    try:
+        control = ControlServer('status', {'quit': application.quit})
+    except RuntimeError:
+        sys.exit(0)
+    
+    # Один процесс на все модули: каждый источник будится своими сигналами,
+    # а в простое демон ничего не делает
+    servers = {name: StatusServer(name) for name in ('mpris', 'volume')}
+    application.aboutToQuit.connect(control.close)
+    
+    # Источники поднимаются независимо: упавший при запуске не должен
+    # оставить без данных остальные модули
+    try:
+        mpris = MPRIS(watch=True)
+        emitter = StatusEmitter(mpris, lambda icon: servers['mpris'].publish({'text': icon}))
+        recorder = HistoryRecorder(mpris.registry, TrackHistory())
+        application.aboutToQuit.connect(recorder.close)
+    except Exception as exception:
+        tracing.error('status.mpris', exception)
+    
+    try:
+        volume = VolumeSource(servers['volume'].publish)
+    except Exception as exception:
+        tracing.error('status.volume', exception)
+    
+    for server in servers.values():
+        application.aboutToQuit.connect(server.close)
+    
+    sys.exit(application.exec())
@@ -0,0 +1,248 @@
+import os
+import sys
+import json
+import time
+import atexit
+import signal
+import socket
+import threading
+import functools
+import contextlib
+
+from collections import Counter, deque
+
+
+class Histogram:
+    # Логарифмические корзины по микросекундам: запись стоит одного
+    # bit_length и пары сложений
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = 0
+    
+    
+    def record(self, microseconds):
+        microseconds = max(1, int(microseconds))
+        
+        self.buckets[microseconds.bit_length()] += 1
+        self.count += 1
+        self.total += microseconds
+        self.maximum = max(self.maximum, microseconds)
+        self.minimum = microseconds if self.minimum is None else min(self.minimum, microseconds)
+    
+    
+    def percentile(self, point):
+        threshold = self.count * point / 100
+        seen = 0
+        
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            
+            if seen >= threshold:
+                return min(1 << bucket, self.maximum)
+        
+        return self.maximum
+    
+    
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': self.total / 1000,
+            'min_ms': (self.minimum or 0) / 1000,
+            'max_ms': self.maximum / 1000,
+            'p50_ms': self.percentile(50) / 1000,
+            'p90_ms': self.percentile(90) / 1000,
+            'p99_ms': self.percentile(99) / 1000,
+            'buckets_us': {1 << bucket: count for bucket, count in sorted(self.buckets.items())}
+        }
+
+
+class Tracer:
+    def __init__(self, path, chrome_path=None, max_events=200_000):
+        self.path = path
+        self.chrome_path = chrome_path
+        self.histograms = {}
+        self.counters = Counter()
+        self.events = deque(maxlen=max_events) if chrome_path else None
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.wakeup = None
+        self.pending = False
+    
+    
+    @contextlib.contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+    
+    
+    def record(self, name, start, end):
+        duration = (end - start) * 1_000_000
+        
+        with self.lock:
+            histogram = self.histograms.get(name)
+            
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            
+            histogram.record(duration)
+            
+            if self.events is not None:
+                self.events.append({
+                    'name': name,
+                    'ph': 'X',
+                    'ts': (start - self.origin) * 1_000_000,
+                    'dur': duration,
+                    'pid': os.getpid(),
+                    'tid': threading.get_ident()
+                })
+    
+    
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+    
+    
+    def dump(self):
+        with self.lock:
+            report = {
+                'pid': os.getpid(),
+                'uptime_s': time.perf_counter() - self.origin,
+                'counters': dict(self.counters),
+                'histograms': {
+                    name: histogram.as_dict()
+                    for name, histogram in sorted(self.histograms.items())
+                }
+            }
+            events = list(self.events) if self.events is not None else None
+        
+        try:
+            with open(self.path, 'w') as file:
+                json.dump(report, file, indent=4)
+            
+            if events is not None:
+                with open(self.chrome_path, 'w') as file:
+                    json.dump({'traceEvents': events}, file)
+        except OSError as exception:
+            print(exception)
+    
+    
+    def dump_pending(self):
+        if self.pending:
+            self.pending = False
+            self.dump()
+
+
+def create():
+    path = os.environ.get('SOFT_DOTS_TRACE')
+    
+    if not path:
+        return None
+    
+    # SOFT_DOTS_TRACE=1 выбирает путь к отчёту в /tmp автоматически
+    if path == '1':
+        path = f'/tmp/soft_dots-{os.path.basename(sys.argv[0])}-{os.getpid()}.json'
+    
+    return Tracer(path, os.environ.get('SOFT_DOTS_TRACE_CHROME'))
+
+
+tracer = create()
+enabled = tracer is not None
+
+
+def span(name):
+    if tracer is None:
+        return contextlib.nullcontext()
+    
+    return tracer.span(name)
+
+
+def count(name, value=1):
+    if tracer is not None:
+        tracer.count(name, value)
+
+
+def record(name, start, end=None):
+    if tracer is not None:
+        tracer.record(name, start, time.perf_counter() if end is None else end)
+
+
+def error(name, exception):
+    print(exception)
+    count(f'{name}.errors')
+
+
+def traced(name):
+    # Без SOFT_DOTS_TRACE декоратор возвращает функцию как есть, так что
+    # выключенная трассировка ничего не стоит на горячем пути
+    def decorator(function):
+        if tracer is None:
+            return function
+        
+        @functools.wraps(function)
+        def wrapper(*arguments, **keywords):
+            start = time.perf_counter()
+            
+            try:
+                return function(*arguments, **keywords)
+            finally:
+                tracer.record(name, start, time.perf_counter())
+        
+        return wrapper
+    
+    return decorator
+
+
+def first_frame():
+    count('ui.first_frame')
+    
+    # Режим замера старта: стенд bench/startup.py ждёт эту строку и
+    # сразу завершает процесс
+    if os.environ.get('SOFT_DOTS_FIRST_FRAME'):
+        print(f'first-frame {time.time()}', flush=True)
+        os._exit(0)
+
+
+def install():
+    if tracer is None:
+        return None
+    
+    atexit.register(tracer.dump)
+    
+    # Сигнал может прервать главный поток внутри with tracer.lock, поэтому
+    # обработчик только ставит флаг, а отчёт пишет цикл Qt или отдельный
+    # поток, который дождётся освобождения блокировки
+    def on_signal(*_):
+        tracer.pending = True
+        
+        if tracer.wakeup is None:
+            threading.Thread(target=tracer.dump_pending, daemon=True).start()
+    
+    
+    def on_wakeup():
+        reader.recv(64)
+        tracer.dump_pending()
+    
+    
+    signal.signal(signal.SIGUSR1, on_signal)
+    
+    # Обработчик сигнала выполняется, только когда интерпретатор получает
+    # управление, поэтому будим цикл Qt через wakeup fd
+    if 'PyQt6.QtCore' in sys.modules:
+        from PyQt6.QtCore import QSocketNotifier
+        
+        reader, writer = socket.socketpair()
+        reader.setblocking(False)
+        writer.setblocking(False)
+        signal.set_wakeup_fd(writer.fileno())
+        
+        notifier = QSocketNotifier(reader.fileno(), QSocketNotifier.Type.Read)
+        notifier.activated.connect(on_wakeup)
+        
+        tracer.wakeup = (reader, writer, notifier)